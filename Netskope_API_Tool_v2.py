@@ -1,26 +1,132 @@
 import os
+import sys
+import csv
+import io
+import gzip
+import zlib
+import tempfile
+import json
+import hashlib
+import argparse
+import time
+import random
+import functools
+import bisect
+import sqlite3
+import threading
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 
 # ----- CONFIG -----
 
-tenant = input("\nTenant name: ")
-api_key = input("API key: ")
-
-tenant_url = f"https://{tenant}.goskope.com"
-
+tenant = ""
+api_key = ""
+tenant_url = ""
+
+POOL_SIZE = int(os.environ.get("NETSKOPE_POOL_SIZE", "10"))
+CONCURRENCY = int(os.environ.get("NETSKOPE_CONCURRENCY", "1"))
+PUBLISHER_CACHE_TTL = int(os.environ.get("NETSKOPE_PUBLISHER_CACHE_TTL", "300"))
+PAGE_SIZE = int(os.environ.get("NETSKOPE_PAGE_SIZE", "1000"))
+BULK_CHUNK_SIZE = int(os.environ.get("NETSKOPE_BULK_CHUNK_SIZE", "200"))
+BULK_CONCURRENCY = int(os.environ.get("NETSKOPE_BULK_CONCURRENCY", "4"))
+BULK_RETRIES = int(os.environ.get("NETSKOPE_BULK_RETRIES", "2"))
+BULK_TIMEOUT = int(os.environ.get("NETSKOPE_BULK_TIMEOUT", "60"))
+TAG_BATCH_SIZE = int(os.environ.get("NETSKOPE_TAG_BATCH_SIZE", "500"))
+SCIM_BULK_OPERATIONS = int(os.environ.get("NETSKOPE_SCIM_BULK_OPERATIONS", "100"))
+# RFC 7644 failOnErrors: stop a /Bulk request after this many errors; 0 leaves the field
+# out so the server processes every operation
+SCIM_BULK_FAIL_ON_ERRORS = int(os.environ.get("NETSKOPE_SCIM_BULK_FAIL_ON_ERRORS", "0"))
+MEMBER_CHUNK_SIZE = int(os.environ.get("NETSKOPE_MEMBER_CHUNK_SIZE", "500"))
+IDENTITY_CACHE_SIZE = int(os.environ.get("NETSKOPE_IDENTITY_CACHE_SIZE", "50000"))
+IDENTITY_CACHE_TTL = int(os.environ.get("NETSKOPE_IDENTITY_CACHE_TTL", "3600"))
+IDENTITY_CACHE_PATH = os.environ.get("NETSKOPE_IDENTITY_CACHE", "")
+RESUME = os.environ.get("NETSKOPE_RESUME", "") == "1"
+METRICS_SAMPLES = int(os.environ.get("NETSKOPE_METRICS_SAMPLES", "10000"))
+METRICS_FILE = os.environ.get("NETSKOPE_METRICS_FILE", "")
+METRICS_SUMMARY_PATH = os.environ.get("NETSKOPE_METRICS_SUMMARY", "")
+CONFIG_PATH = os.environ.get("NETSKOPE_CONFIG", os.path.join(os.path.expanduser("~"), ".netskope_api_tool.json"))
+LOG_DIR = os.environ.get("NETSKOPE_LOG_DIR") or (
+    "c:\\Netskope_API_Tool" if os.name == "nt" else os.path.join(os.path.expanduser("~"), "Netskope_API_Tool"))
+JOURNAL_PATH = os.environ.get("NETSKOPE_JOURNAL") or os.path.join(LOG_DIR, "netskope_journal.sqlite")
+JOURNAL_FLUSH_EVERY = int(os.environ.get("NETSKOPE_JOURNAL_FLUSH_EVERY", "50"))
+JOURNAL_FLUSH_INTERVAL = float(os.environ.get("NETSKOPE_JOURNAL_FLUSH_INTERVAL", "2"))
+JOURNAL_RETENTION_DAYS = float(os.environ.get("NETSKOPE_JOURNAL_RETENTION_DAYS", "30"))
+LOG_FORMAT = os.environ.get("NETSKOPE_LOG_FORMAT", "jsonl")
+LOG_GZIP = os.environ.get("NETSKOPE_LOG_GZIP", "") == "1"
+LOG_ROTATE_MB = float(os.environ.get("NETSKOPE_LOG_ROTATE_MB", "0"))
+LOG_FLUSH_EVERY = int(os.environ.get("NETSKOPE_LOG_FLUSH_EVERY", "100"))
+LOG_FLUSH_INTERVAL = float(os.environ.get("NETSKOPE_LOG_FLUSH_INTERVAL", "2"))
+SNAPSHOT_PATH = os.environ.get("NETSKOPE_SNAPSHOT") or os.path.join(LOG_DIR, "netskope_snapshot.sqlite")
+SNAPSHOT_TTL = float(os.environ.get("NETSKOPE_SNAPSHOT_TTL", "900"))
+SNAPSHOT_AUTO = os.environ.get("NETSKOPE_SNAPSHOT_AUTO", "") == "1"
+KEYRING_SERVICE = os.environ.get("NETSKOPE_KEYRING_SERVICE", "netskope-api-tool")
+MAX_RETRIES = int(os.environ.get("NETSKOPE_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.environ.get("NETSKOPE_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.environ.get("NETSKOPE_BACKOFF_MAX", "60"))
+
+# Requests per second for each endpoint family, until the server advertises its own limit
+RATE_LIMITS = {
+    family: float(os.environ.get(f"NETSKOPE_RATE_{family.upper()}", "4"))
+    for family in ("scim", "steering", "policy", "infrastructure", "other")
+}
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+_buckets: Dict[tuple, "TokenBucket"] = {}
+_buckets_lock = threading.Lock()
+
+_identity_caches: Dict[str, "IdentityCache"] = {}
+_identity_caches_lock = threading.Lock()
+
+_scim_bulk_support: Dict[str, Optional[dict]] = {}
+_scim_bulk_lock = threading.Lock()
+
+_publisher_catalogues: Dict[str, dict] = {}
+_app_indexes: Dict[str, "AppIndex"] = {}
+_app_indexes_lock = threading.Lock()
+_publisher_catalogues_lock = threading.Lock()
+
+_policy_name_indexes: Dict[str, "PolicyNameIndex"] = {}
+_policy_name_indexes_lock = threading.Lock()
+
+
+def configure(tenant_name, key):
+    global tenant, api_key, tenant_url
+    tenant = tenant_name
+    api_key = key
+    tenant_url = f"https://{tenant}.goskope.com"
+
+def load_credentials(tenant_name=None, key=None):
+    # Explicit values first, then NETSKOPE_TENANT/NETSKOPE_API_KEY, then the JSON config
+    # file, then the system keyring (optional dependency) for the API key
+    tenant_name = tenant_name or os.environ.get("NETSKOPE_TENANT", "")
+    key = key or os.environ.get("NETSKOPE_API_KEY", "")
+    if not (tenant_name and key) and os.path.exists(CONFIG_PATH):
+        try:
+            with open(CONFIG_PATH, encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"\n[WARN] Unable to read {CONFIG_PATH}: {e}")
+            config = {}
+        tenant_name = tenant_name or config.get("tenant", "")
+        key = key or config.get("api_key", "")
+    if tenant_name and not key:
+        try:
+            import keyring
+            key = keyring.get_password(KEYRING_SERVICE, tenant_name) or ""
+        except Exception:
+            key = ""
+    return tenant_name, key
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
-def scim_header():
-    return {
-        "accept": "application/json",
-        "Authorization": "Bearer " + api_key
-    }
-
 def api_header():
     return {
         "accept": "application/json",
@@ -28,18 +134,1059 @@ def api_header():
         "Content-Type": "application/json"
     }
 
-def safe_request(method, url, headers=None, json=None, params=None, timeout=15):
-    try:
-        r = requests.request(method, url, headers=headers, json=json, params=params, timeout=timeout)
-        return r
-    except requests.exceptions.Timeout:
-        print("\n[ERROR] Request timed out.")
-    except requests.exceptions.ConnectionError:
-        print("\n[ERROR] Connection error. Check your network or tenant URL.")
-    except requests.exceptions.RequestException as e:
-        print(f"\n[ERROR] Request failed: {e}")
+# ----- TRANSPORT -----
+
+def get_session():
+    # One keep-alive session per tenant, auth headers attached once
+    with _sessions_lock:
+        session = _sessions.get(tenant_url)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(api_header())
+            _sessions[tenant_url] = session
+        return session
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+def connection_stats():
+    opened = requests_sent = 0
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+    for session in sessions:
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                opened += pool.num_connections
+                requests_sent += pool.num_requests
+    return {"opened": opened, "reused": max(requests_sent - opened, 0)}
+
+def print_connection_stats():
+    stats = connection_stats()
+    print(f"\nConnections opened: {stats['opened']} | reused: {stats['reused']}")
+    for family, state in throttle_state().items():
+        print(f"{family}: {state['throttled']} throttled, {state['retries']} retried")
+
+class TokenBucket:
+    # Client-side limiter for one endpoint family, adjusted from the server's rate-limit headers
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.retries = 0
+        self.remaining = None
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        # Takes one token and returns how long the caller must wait before sending
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = max(0.0, self.paused_until - now)
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+            return wait
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, status_code, headers):
+        limit = _header_number(headers, "ratelimit-limit", "x-ratelimit-limit")
+        remaining = _header_number(headers, "ratelimit-remaining", "x-ratelimit-remaining")
+        reset = _header_number(headers, "ratelimit-reset", "x-ratelimit-reset")
+        with self.lock:
+            if status_code == 429:
+                self.throttled += 1
+            if limit and limit > 0:
+                # Netskope advertises its limit per second for each endpoint
+                self.rate = limit
+                self.capacity = limit
+            if remaining is not None:
+                self.remaining = remaining
+                if remaining <= 0 and reset:
+                    self.paused_until = max(self.paused_until, time.monotonic() + reset)
+
+    def state(self):
+        with self.lock:
+            return {
+                "rate": self.rate,
+                "tokens": round(max(self.tokens, 0.0), 2),
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+                "remaining": self.remaining,
+                "throttled": self.throttled,
+                "retries": self.retries,
+            }
+
+def _header_number(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(str(value).split(",")[0].strip())
+        except ValueError:
+            continue
     return None
 
+def endpoint_family(url):
+    path = url.split("/api/v2/", 1)[-1]
+    family = path.split("/", 1)[0].split("?", 1)[0]
+    return family if family in RATE_LIMITS else "other"
+
+def get_bucket(family):
+    with _buckets_lock:
+        bucket = _buckets.get((tenant_url, family))
+        if bucket is None:
+            bucket = TokenBucket(RATE_LIMITS.get(family, RATE_LIMITS["other"]))
+            _buckets[(tenant_url, family)] = bucket
+        return bucket
+
+def throttle_state():
+    with _buckets_lock:
+        return {family: bucket.state() for (url, family), bucket in _buckets.items() if url == tenant_url}
+
+# Methods safe to resend after any 5xx; a 5xx on a write may arrive after the server
+# already committed it, so writes are only retried when the server asks for it
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def retry_delay(status_code, headers, attempt, method="GET"):
+    # Seconds to wait before retrying, or None when the response should not be retried
+    if status_code != 429 and status_code < 500:
+        return None
+    if attempt >= MAX_RETRIES:
+        return None
+    retry_after = headers.get("Retry-After")
+    if method.upper() not in SAFE_METHODS and status_code != 429 and not (status_code == 503 and retry_after):
+        return None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(retry_after)
+                return max(0.0, when.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    backoff = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return backoff * random.uniform(0.5, 1.0)
+
+def safe_request(method, url, json=None, params=None, timeout=15):
+    family = endpoint_family(url)
+    bucket = get_bucket(family)
+    attempt = 0
+    while True:
+        wait = bucket.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        started = time.monotonic()
+        try:
+            r = get_session().request(method, url, json=json, params=params, timeout=timeout)
+        except requests.exceptions.Timeout:
+            record_request(method, url, 0, time.monotonic() - started)
+            print("\n[ERROR] Request timed out.")
+            return None
+        except requests.exceptions.ConnectionError:
+            record_request(method, url, 0, time.monotonic() - started)
+            print("\n[ERROR] Connection error. Check your network or tenant URL.")
+            return None
+        except requests.exceptions.RequestException as e:
+            record_request(method, url, 0, time.monotonic() - started)
+            print(f"\n[ERROR] Request failed: {e}")
+            return None
+
+        bucket.observe(r.status_code, r.headers)
+        delay = retry_delay(r.status_code, r.headers, attempt, method)
+        record_request(method, url, r.status_code, time.monotonic() - started,
+                       _body_size(r.request.body), len(r.content), retried=delay is not None)
+        if delay is None:
+            return r
+
+        if r.status_code == 429:
+            bucket.pause(delay)
+        with bucket.lock:
+            bucket.retries += 1
+        print(f"\n[WARN] HTTP {r.status_code} from {family} API, retrying in {delay:.1f}s...")
+        time.sleep(delay)
+        attempt += 1
+
+class ListingError(RuntimeError):
+    # A page of a paged listing could not be read, so the listing is incomplete
+    pass
+
+def _listing_page(r, what, position):
+    # JSON body of one listing page (requests or httpx response); raises instead of
+    # letting a listing end early
+    if r is None or r.status_code >= 400:
+        status = f"HTTP {r.status_code}" if r is not None else "no response"
+        raise ListingError(f"{what} listing failed at {position} ({status})")
+    try:
+        return r.json()
+    except ValueError:
+        raise ListingError(f"{what} listing failed at {position} (invalid JSON)")
+
+def run_concurrent(func, items, concurrency=None):
+    # Bounded worker pool; results are yielded in the original item order and items are
+    # pulled lazily, so streamed inputs start processing before they are fully read
+    workers = max(1, concurrency or CONCURRENCY)
+    if workers == 1:
+        for item in items:
+            yield func(item)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        window = deque()
+        for item in items:
+            window.append(executor.submit(func, item))
+            if len(window) >= workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+# ----- METRICS -----
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def endpoint_path(url):
+    # "/steering/apps/private/123?x=1" -> "/steering/apps/private/{id}"
+    path = url.split("://", 1)[-1]
+    path = "/" + path.split("/", 1)[1] if "/" in path else "/"
+    path = path.split("?", 1)[0]
+    if path.startswith("/api/v2/"):
+        path = path[len("/api/v2"):]
+    segments = []
+    for segment in path.split("/"):
+        if segment.isdigit() or (len(segment) >= 16 and all(c in "0123456789abcdefABCDEF-" for c in segment)):
+            segment = "{id}"
+        segments.append(segment)
+    return "/".join(segments)
+
+class EndpointStats:
+    __slots__ = ("count", "total", "buckets", "samples", "statuses", "retries", "sent", "received")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.samples = deque(maxlen=METRICS_SAMPLES)
+        self.statuses: Dict[int, int] = {}
+        self.retries = 0
+        self.sent = 0
+        self.received = 0
+
+    def percentile(self, ordered, fraction):
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class RequestMetrics:
+    # Per-endpoint latency histogram, byte counts, status tallies and retries
+
+    def __init__(self):
+        self.endpoints: Dict[tuple, EndpointStats] = {}
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def observe(self, method, url, status, latency, sent, received, retried):
+        key = (method.upper(), endpoint_path(url))
+        with self.lock:
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = EndpointStats()
+            stats.count += 1
+            stats.total += latency
+            for position, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats.buckets[position] += 1
+                    break
+            stats.samples.append(latency)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.retries += int(retried)
+            stats.sent += sent
+            stats.received += received
+
+    def summary(self):
+        with self.lock:
+            items = [(key, stats, sorted(stats.samples), dict(stats.statuses)) for key, stats in self.endpoints.items()]
+        endpoints = {}
+        for (method, path), stats, ordered, statuses in sorted(items, key=lambda item: item[0]):
+            endpoints[f"{method} {path}"] = {
+                "requests": stats.count,
+                "retries": stats.retries,
+                "statuses": {str(code): count for code, count in sorted(statuses.items())},
+                "p50_ms": round(stats.percentile(ordered, 0.50) * 1000, 1),
+                "p95_ms": round(stats.percentile(ordered, 0.95) * 1000, 1),
+                "p99_ms": round(stats.percentile(ordered, 0.99) * 1000, 1),
+                "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 1),
+                "bytes_sent": stats.sent,
+                "bytes_received": stats.received,
+            }
+        return {
+            "elapsed_s": round(time.time() - self.started, 2),
+            "requests": sum(e["requests"] for e in endpoints.values()),
+            "retries": sum(e["retries"] for e in endpoints.values()),
+            "bytes_sent": sum(e["bytes_sent"] for e in endpoints.values()),
+            "bytes_received": sum(e["bytes_received"] for e in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+    def openmetrics(self):
+        lines = [
+            "# TYPE netskope_request_duration_seconds histogram",
+            "# UNIT netskope_request_duration_seconds seconds",
+        ]
+        with self.lock:
+            items = sorted(self.endpoints.items())
+            for (method, path), stats in items:
+                labels = f'method="{method}",endpoint="{path}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'netskope_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'netskope_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f"netskope_request_duration_seconds_count{{{labels}}} {stats.count}")
+                lines.append(f"netskope_request_duration_seconds_sum{{{labels}}} {stats.total:.6f}")
+            lines.append("# TYPE netskope_requests counter")
+            for (method, path), stats in items:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'netskope_requests_total{{method="{method}",endpoint="{path}",status="{status}"}} {count}')
+            for name, attribute in (("request_retries", "retries"), ("request_sent_bytes", "sent"),
+                                    ("response_received_bytes", "received")):
+                lines.append(f"# TYPE netskope_{name} counter")
+                for (method, path), stats in items:
+                    value = getattr(stats, attribute)
+                    lines.append(f'netskope_{name}_total{{method="{method}",endpoint="{path}"}} {value}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+_metrics = RequestMetrics()
+_metrics_scopes: List[RequestMetrics] = []
+_metrics_scopes_lock = threading.Lock()
+
+def get_metrics():
+    return _metrics
+
+def record_request(method, url, status, latency, sent=0, received=0, retried=False):
+    with _metrics_scopes_lock:
+        collectors = [_metrics] + _metrics_scopes
+    for collector in collectors:
+        collector.observe(method, url, status, latency, sent, received, retried)
+
+def _body_size(body):
+    if body is None:
+        return 0
+    return len(body) if isinstance(body, (bytes, bytearray)) else len(str(body).encode())
+
+def metered(label):
+    # Collects the requests of one bulk run and prints their JSON summary when it ends
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            scope = RequestMetrics()
+            with _metrics_scopes_lock:
+                _metrics_scopes.append(scope)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with _metrics_scopes_lock:
+                    _metrics_scopes.remove(scope)
+                summary = dict(scope.summary(), run=label)
+                if summary["requests"]:
+                    print(f"\n[METRICS] {json.dumps(summary)}")
+                    if METRICS_SUMMARY_PATH:
+                        with open(METRICS_SUMMARY_PATH, "a", encoding="utf-8") as f:
+                            f.write(json.dumps(summary) + "\n")
+        return wrapper
+    return decorator
+
+def write_openmetrics(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(get_metrics().openmetrics())
+
+
+# ----- JOB JOURNAL -----
+
+def run_identity(file_path, sheet_name=None):
+    # Same file path, sheet and content: only such a run can be resumed
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return payload_hash([os.path.abspath(file_path), sheet_name or "", digest.hexdigest()])
+
+class JobJournal:
+    # Append-only SQLite record of every row a bulk job sends, committed in batches
+    # so an interrupted run can be resumed without resending what already succeeded.
+    # Rows belong to a run (see run_identity); a resume only reads the latest unfinished
+    # attempt of the same run.
+
+    def __init__(self, path, tenant_key, job, run, flush_every=None, flush_interval=None):
+        self.tenant_key = tenant_key
+        self.job = job
+        self.run = run
+        self.started_at = None
+        self.flush_every = flush_every or JOURNAL_FLUSH_EVERY
+        self.flush_interval = JOURNAL_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.pending = []
+        self.flushed = time.monotonic()
+        self.lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, tenant TEXT, job TEXT, key TEXT, input_hash TEXT, "
+            "request TEXT, status INTEGER, created_id TEXT, ok INTEGER, finished_at REAL, run TEXT)"
+        )
+        if "run" not in [column[1] for column in self.db.execute("PRAGMA table_info(journal)")]:
+            # Journals written before runs were tracked; their rows are never resumed from
+            self.db.execute("ALTER TABLE journal ADD COLUMN run TEXT")
+        self.db.execute("DROP INDEX IF EXISTS journal_job")
+        self.db.execute("CREATE INDEX IF NOT EXISTS journal_run ON journal (tenant, job, run, key)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS journal_runs ("
+            "tenant TEXT, job TEXT, run TEXT, started_at REAL, finished INTEGER, PRIMARY KEY (tenant, job, run))"
+        )
+        if JOURNAL_RETENTION_DAYS > 0:
+            # Entries older than the retention period can no longer be resumed from
+            cutoff = time.time() - JOURNAL_RETENTION_DAYS * 86400
+            self.db.execute("DELETE FROM journal WHERE finished_at < ?", (cutoff,))
+            self.db.execute("DELETE FROM journal_runs WHERE started_at < ?", (cutoff,))
+        self.db.commit()
+
+    def start(self, resume):
+        # Continues the latest attempt of this run when it did not finish, otherwise starts
+        # a new one whose rows are the only ones a later resume reads. True when resuming.
+        with self.lock:
+            row = self.db.execute(
+                "SELECT started_at, finished FROM journal_runs WHERE tenant = ? AND job = ? AND run = ?",
+                (self.tenant_key, self.job, self.run)
+            ).fetchone()
+            if resume and row and not row[1]:
+                self.started_at = row[0]
+                return True
+            self.started_at = time.time()
+            self.db.execute("INSERT OR REPLACE INTO journal_runs VALUES (?, ?, ?, ?, 0)",
+                            (self.tenant_key, self.job, self.run, self.started_at))
+            self.db.commit()
+            return False
+
+    def finish(self):
+        # Every row succeeded: nothing is left to resume
+        with self.lock:
+            self._flush()
+            self.db.execute("UPDATE journal_runs SET finished = 1 WHERE tenant = ? AND job = ? AND run = ?",
+                            (self.tenant_key, self.job, self.run))
+            self.db.commit()
+
+    def completed(self):
+        return set(self.created_ids())
+
+    def created_ids(self):
+        # key -> created ID for every completed row of the current attempt
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT key, created_id FROM journal WHERE tenant = ? AND job = ? AND run = ? AND ok = 1 "
+                "AND finished_at >= ?", (self.tenant_key, self.job, self.run, self.started_at)
+            ).fetchall()
+        return {key: created_id for key, created_id in rows}
+
+    def record(self, key, input_hash, request, status, created_id, ok):
+        with self.lock:
+            self.pending.append((
+                self.tenant_key, self.job, key, input_hash, json.dumps(request, default=str),
+                status, None if created_id is None else str(created_id), int(bool(ok)), time.time(), self.run
+            ))
+            if len(self.pending) >= self.flush_every or time.monotonic() - self.flushed >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.db.executemany(
+                "INSERT INTO journal (tenant, job, key, input_hash, request, status, created_id, ok, finished_at, run) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self.pending)
+            self.db.commit()
+            self.pending = []
+        self.flushed = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.db.close()
+
+def payload_hash(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def _response_result(r):
+    # (status code, created id, ok) for a Netskope API response
+    if r is None:
+        return 0, None, False
+    try:
+        body = r.json()
+    except ValueError:
+        return r.status_code, None, False
+    data = body.get("data") if isinstance(body, dict) else None
+    if isinstance(data, list):
+        data = data[0] if data else None
+    created_id = None
+    if isinstance(data, dict):
+        created_id = data.get("app_id") or data.get("rule_id") or data.get("id")
+    ok = body.get("status") == "success"
+    return r.status_code, created_id if ok else None, ok
+
+def _start_journal(journal, resume):
+    resume = RESUME if resume is None else resume
+    if journal.start(resume):
+        return True
+    if resume:
+        print("\n[INFO] No unfinished run of this sheet to resume, sending every row.")
+    return False
+
+def run_journaled(job, func, items, run, resume=None, run_log=None):
+    # items are (input_hash, item) pairs and func(item) returns (record, response, request);
+    # records go to run_log as they complete and only the counts are kept in memory.
+    # Identical inputs are told apart by their occurrence number, so duplicated rows
+    # are still sent as many times as they appear in the sheet.
+    journal = JobJournal(JOURNAL_PATH, tenant_url, job, run)
+    done = journal.completed() if _start_journal(journal, resume) else set()
+    occurrences = {}
+    skipped = 0
+    succeeded = 0
+
+    def pending():
+        nonlocal skipped
+        for input_hash, item in items:
+            occurrences[input_hash] = occurrences.get(input_hash, 0) + 1
+            key = f"{input_hash}#{occurrences[input_hash]}"
+            if key in done:
+                skipped += 1
+                continue
+            yield key, input_hash, item
+
+    def send(entry):
+        key, input_hash, item = entry
+        record, r, request = func(item)
+        status, created_id, ok = _response_result(r)
+        journal.record(key, input_hash, request, status, created_id, ok)
+        if run_log is not None:
+            run_log.write(dict(record, created_id=created_id))
+        return ok
+
+    sent = 0
+    try:
+        for ok in run_concurrent(send, pending()):
+            sent += 1
+            succeeded += int(ok)
+        if succeeded == sent:
+            journal.finish()
+    finally:
+        journal.close()
+
+    if skipped:
+        print(f"\n[INFO] Resumed: {skipped} rows already completed in a previous run were skipped.")
+    return {"sent": sent, "succeeded": succeeded, "skipped": skipped}
+
+
+# ----- INVENTORY SNAPSHOT -----
+
+PUBLISHER_FIELDS = ("publisher_id", "publisher_name")
+
+def iter_publishers():
+    # Only the ID and name are kept: they are what create_apps sends for each publisher
+    r = safe_request("GET", f"{tenant_url}/api/v2/infrastructure/publishers",
+                     params={"fields": ",".join(PUBLISHER_FIELDS)})
+    body = _listing_page(r, "Publisher", "page 1")
+    if body.get("status") != "success":
+        raise ListingError(f"Publisher listing failed: {r.text}")
+    for publisher in body.get("data", {}).get("publishers", []) or []:
+        yield {key: publisher.get(key) for key in PUBLISHER_FIELDS}
+
+INVENTORY_COLLECTIONS = {
+    "private_apps": lambda fields=None: iter_private_apps(fields=fields),
+    "publishers": lambda fields=None: iter_publishers(),
+    "npa_rules": lambda fields=None: iter_npa_rules(fields=fields),
+    "scim_users": lambda fields=None: iter_scim_resources("Users"),
+    "scim_groups": lambda fields=None: iter_scim_resources("Groups"),
+}
+
+# Record ID per collection and, where the API exposes a modification time, its field
+# and the endpoint a single changed record is refetched from
+INVENTORY_KEYS = {"private_apps": "app_id", "publishers": "publisher_id", "npa_rules": "rule_id",
+                  "scim_users": "id", "scim_groups": "id"}
+INVENTORY_MODIFIED = {"private_apps": "modify_time", "npa_rules": "modify_time"}
+INVENTORY_ITEMS = {"private_apps": "/api/v2/steering/apps/private/{}", "npa_rules": "/api/v2/policy/npa/rules/{}"}
+
+def _record_id(collection, record):
+    value = record.get(INVENTORY_KEYS.get(collection))
+    return str(value) if value is not None else payload_hash(record)
+
+def _encode_body(record):
+    return zlib.compress(json.dumps(record, default=str).encode())
+
+def _decode_body(body):
+    # Snapshots written before bodies were compressed hold plain JSON text
+    return json.loads(body if isinstance(body, str) else zlib.decompress(body))
+
+class InventorySnapshot:
+    # Local SQLite copy of tenant collections, one row per record with its content digest
+    # and modification time, so a refresh only rewrites the records that changed. Bodies
+    # are stored zlib-compressed per record rather than as one compressed file
+
+    def __init__(self, path, tenant_key):
+        self.path = path
+        self.tenant_key = tenant_key
+        self.loaded = {}
+        self.lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS inventory_records ("
+            "tenant TEXT, collection TEXT, record_id TEXT, position INTEGER, digest TEXT, modified TEXT, "
+            "body BLOB, PRIMARY KEY (tenant, collection, record_id))"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS inventory_collections ("
+            "tenant TEXT, collection TEXT, fetched_at REAL, page_digests TEXT, PRIMARY KEY (tenant, collection))"
+        )
+        self.db.commit()
+
+    def _collection(self, collection):
+        return self.db.execute(
+            "SELECT fetched_at, page_digests FROM inventory_collections WHERE tenant = ? AND collection = ?",
+            (self.tenant_key, collection)
+        ).fetchone()
+
+    def fetched_at(self, collection):
+        with self.lock:
+            row = self._collection(collection)
+        return row[0] if row else None
+
+    def page_digests(self, collection):
+        with self.lock:
+            row = self._collection(collection)
+        return json.loads(row[1]) if row and row[1] else []
+
+    def markers(self, collection):
+        # record ID -> (position, digest, modified)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT record_id, position, digest, modified FROM inventory_records "
+                "WHERE tenant = ? AND collection = ?", (self.tenant_key, collection)
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def records(self, collection):
+        # Decoded once and kept until the collection changes; callers must not modify it
+        with self.lock:
+            records = self.loaded.get(collection)
+            if records is None:
+                rows = self.db.execute(
+                    "SELECT body FROM inventory_records WHERE tenant = ? AND collection = ? ORDER BY position",
+                    (self.tenant_key, collection)
+                ).fetchall()
+                records = self.loaded[collection] = [_decode_body(row[0]) for row in rows]
+            return records
+
+    def update(self, collection, order, changed, removed, page_digests=None):
+        # order: every record ID as listed by the API; changed: record ID -> record to write
+        modified = INVENTORY_MODIFIED.get(collection)
+        with self.lock:
+            positions = dict(self.db.execute(
+                "SELECT record_id, position FROM inventory_records WHERE tenant = ? AND collection = ?",
+                (self.tenant_key, collection)
+            ).fetchall())
+            upserts = []
+            moves = []
+            for position, record_id in enumerate(order):
+                record = changed.get(record_id)
+                if record is not None:
+                    marker = record.get(modified) if modified else None
+                    upserts.append((self.tenant_key, collection, record_id, position, payload_hash(record),
+                                    None if marker is None else str(marker), _encode_body(record)))
+                elif positions.get(record_id) != position:
+                    moves.append((position, self.tenant_key, collection, record_id))
+            self.db.executemany(
+                "DELETE FROM inventory_records WHERE tenant = ? AND collection = ? AND record_id = ?",
+                [(self.tenant_key, collection, record_id) for record_id in removed])
+            self.db.executemany("INSERT OR REPLACE INTO inventory_records VALUES (?, ?, ?, ?, ?, ?, ?)", upserts)
+            self.db.executemany(
+                "UPDATE inventory_records SET position = ? WHERE tenant = ? AND collection = ? AND record_id = ?",
+                moves)
+            self.db.execute(
+                "INSERT OR REPLACE INTO inventory_collections VALUES (?, ?, ?, ?)",
+                (self.tenant_key, collection, time.time(),
+                 None if page_digests is None else json.dumps(page_digests)))
+            self.db.commit()
+
+            loaded = self.loaded.get(collection)
+            if loaded is not None and (upserts or moves or removed):
+                by_id = {_record_id(collection, record): record for record in loaded}
+                by_id.update(changed)
+                self.loaded[collection] = [by_id[record_id] for record_id in order]
+        return len(upserts), len(removed)
+
+    def mark_stale(self, collections):
+        # Records are kept so the next refresh can still be incremental
+        with self.lock:
+            self.db.executemany(
+                "UPDATE inventory_collections SET fetched_at = 0 WHERE tenant = ? AND collection = ?",
+                [(self.tenant_key, collection) for collection in collections])
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+_snapshots: Dict[tuple, InventorySnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+def get_snapshot(persist=None):
+    # The tenant's snapshot: in SNAPSHOT_PATH once that file exists (or with
+    # NETSKOPE_SNAPSHOT_AUTO=1), otherwise in memory for the rest of the run
+    if persist is None:
+        persist = SNAPSHOT_AUTO or os.path.exists(SNAPSHOT_PATH)
+    path = SNAPSHOT_PATH if persist else ":memory:"
+    with _snapshots_lock:
+        snapshot = _snapshots.get((path, tenant_url))
+        if snapshot is None:
+            snapshot = _snapshots[(path, tenant_url)] = InventorySnapshot(path, tenant_url)
+        return snapshot
+
+def mark_snapshot_stale(*names):
+    with _snapshots_lock:
+        snapshots = [snapshot for key, snapshot in _snapshots.items() if key[1] == tenant_url]
+    for snapshot in snapshots:
+        snapshot.mark_stale(names)
+
+def invalidates(*names):
+    # Marks snapshot collections stale once an operation that changes them has run
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                mark_snapshot_stale(*names)
+        return wrapper
+    return decorator
+
+def _refresh_by_modified(name, snapshot):
+    # Lists only IDs and modification times, then refetches the records that changed.
+    # None when the API does not return the field or a full listing is cheaper.
+    key, modified = INVENTORY_KEYS[name], INVENTORY_MODIFIED[name]
+    listing = list(INVENTORY_COLLECTIONS[name](fields=f"{key},{modified}"))
+    if any(record.get(modified) is None for record in listing):
+        return None
+
+    markers = snapshot.markers(name)
+    order = [_record_id(name, record) for record in listing]
+    stale = {record_id: str(record[modified]) for record_id, record in zip(order, listing)
+             if record_id not in markers or markers[record_id][2] != str(record[modified])}
+    if len(stale) > -(-len(order) // PAGE_SIZE):
+        return None
+
+    def fetch(record_id):
+        r = safe_request("GET", tenant_url + INVENTORY_ITEMS[name].format(record_id))
+        try:
+            data = r.json().get("data") if r else None
+        except ValueError:
+            return None
+        if isinstance(data, list):
+            data = data[0] if data else None
+        return data if isinstance(data, dict) else None
+
+    changed = {}
+    for record_id, record in zip(stale, run_concurrent(fetch, list(stale))):
+        if record is None:
+            return None
+        record.setdefault(modified, stale[record_id])
+        changed[record_id] = record
+
+    listed = set(order)
+    removed = [record_id for record_id in markers if record_id not in listed]
+    snapshot.update(name, order, changed, removed)
+    return {"total": len(order), "changed": len(changed), "removed": len(removed)}
+
+def store_inventory(name, records, snapshot):
+    # Pages whose digest matches the stored one are skipped; within the others only
+    # records whose own digest differs are rewritten
+    pages = [records[i:i + PAGE_SIZE] for i in range(0, len(records), PAGE_SIZE)]
+    digests = [payload_hash(page) for page in pages]
+    stored = snapshot.page_digests(name)
+    markers = snapshot.markers(name)
+    order = [_record_id(name, record) for record in records]
+
+    changed = {}
+    for index, page in enumerate(pages):
+        if index < len(stored) and stored[index] == digests[index]:
+            continue
+        for record in page:
+            record_id = _record_id(name, record)
+            if record_id not in markers or markers[record_id][1] != payload_hash(record):
+                changed[record_id] = record
+
+    listed = set(order)
+    removed = [record_id for record_id in markers if record_id not in listed]
+    snapshot.update(name, order, changed, removed, digests)
+    return {"total": len(order), "changed": len(changed), "removed": len(removed)}
+
+def refresh_inventory(name, snapshot=None, full=False):
+    # Brings one collection of the snapshot up to date: by modification time where the
+    # API exposes it and the collection was fetched before, otherwise by content digest
+    snapshot = snapshot or get_snapshot()
+    result = None
+    if not full and name in INVENTORY_MODIFIED and snapshot.fetched_at(name) is not None:
+        result = _refresh_by_modified(name, snapshot)
+    if result is None:
+        result = store_inventory(name, list(INVENTORY_COLLECTIONS[name]()), snapshot)
+    return result
+
+def inventory(name, max_age=None):
+    # Read-through cache: a collection older than max_age seconds (default
+    # NETSKOPE_SNAPSHOT_TTL) is refreshed before it is returned
+    max_age = SNAPSHOT_TTL if max_age is None else max_age
+    snapshot = get_snapshot()
+    fetched_at = snapshot.fetched_at(name)
+    if fetched_at is None or time.time() - fetched_at > max_age:
+        refresh_inventory(name, snapshot)
+    return snapshot.records(name)
+
+def fetch_inventory(names=None, snapshot=None, full=False):
+    names = list(names or INVENTORY_COLLECTIONS)
+    unknown = [name for name in names if name not in INVENTORY_COLLECTIONS]
+    if unknown:
+        raise ValueError(f"unknown collections: {', '.join(unknown)}")
+
+    def fetch(name):
+        started = time.monotonic()
+        if snapshot is None:
+            records = list(INVENTORY_COLLECTIONS[name]())
+            print(f"[OK] {name}: {len(records)} records in {time.monotonic() - started:.1f}s")
+        else:
+            result = refresh_inventory(name, snapshot, full)
+            records = snapshot.records(name)
+            print(f"[OK] {name}: {len(records)} records, {result['changed']} changed, "
+                  f"{result['removed']} removed in {time.monotonic() - started:.1f}s")
+        return name, records
+
+    return dict(run_concurrent(fetch, names, len(names)))
+
+def _flat_value(value):
+    return json.dumps(value, default=str) if isinstance(value, (list, dict)) else value
+
+def write_collection(records, path, fmt):
+    if fmt == "jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+        return
+
+    fields = list(OrderedDict((key, None) for record in records for key in record))
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for record in records:
+                writer.writerow(_flat_value(record.get(field)) for field in fields)
+        return
+
+    if fmt == "parquet":
+        import pandas as pd
+        try:
+            import pyarrow
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+        frame = pd.DataFrame([[_flat_value(record.get(field)) for field in fields] for record in records],
+                             columns=fields)
+        frame.to_parquet(path, index=False)
+        return
+
+    raise ValueError(f"unsupported export format '{fmt}'")
+
+@metered("export_inventory")
+def export_inventory(directory: str = None, fmt: str = "jsonl", names=None, snapshot: bool = True,
+                     full: bool = False):
+
+    directory = directory or os.path.join(LOG_DIR, "exports")
+    print("\n### Exporting tenant inventory ###\n")
+    try:
+        collections = fetch_inventory(names, get_snapshot(persist=True) if snapshot else None, full)
+    except (ValueError, ListingError) as e:
+        print(f"\n[ERROR] {e}")
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    prefix = datetime.now().strftime("%Y-%m-%d_%Hh%Mm%Ss")
+    paths = {}
+    for name, records in collections.items():
+        path = os.path.join(directory, f"{prefix}_{name}.{fmt}")
+        try:
+            write_collection(records, path, fmt)
+        except (RuntimeError, ValueError) as e:
+            print(f"\n[ERROR] {e}")
+            return None
+        paths[name] = path
+        print(f"[OK] {name} -> {path}")
+
+    if snapshot:
+        print(f"\n[INFO] Snapshot updated in {SNAPSHOT_PATH}")
+    return paths
+
+
+# ----- SPREADSHEET INPUT -----
+
+class SheetRow:
+    # Lightweight row record; the column -> position map is shared by every row of a source
+    __slots__ = ("columns", "values", "line")
+
+    def __init__(self, columns, values, line):
+        self.columns = columns
+        self.values = values
+        self.line = line
+
+    def __getitem__(self, key):
+        position = self.columns[key]
+        return self.values[position] if position < len(self.values) else None
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def get(self, key, default=None):
+        if key not in self.columns:
+            return default
+        value = self[key]
+        return default if _is_blank(value) else value
+
+    def to_dict(self):
+        return {name: self[name] for name in self.columns}
+
+class RowSource:
+    # Streams rows from .xlsx/.xlsm (read-only openpyxl), .csv or .jsonl without loading the whole file
+
+    def __init__(self, file_path, sheet_name=None):
+        self.file_path = file_path
+        self.sheet_name = sheet_name or None
+        self.columns: Dict[str, int] = {}
+        self._close = None
+        self._values = self._open()
+
+    def _set_header(self, header):
+        for name in header:
+            name = "" if name is None else str(name).strip()
+            if name and name not in self.columns:
+                self.columns[name] = len(self.columns)
+            elif not name:
+                self.columns[f"__unnamed_{len(self.columns)}"] = len(self.columns)
+
+    def _open(self):
+        ext = os.path.splitext(self.file_path)[1].lower()
+
+        if ext == ".csv":
+            f = open(self.file_path, newline="", encoding="utf-8-sig")
+            self._close = f.close
+            reader = csv.reader(f)
+            self._set_header(next(reader, []))
+            return reader
+
+        if ext in (".jsonl", ".ndjson"):
+            f = open(self.file_path, encoding="utf-8")
+            self._close = f.close
+            return self._jsonl_values(f)
+
+        if ext in (".xlsx", ".xlsm"):
+            from openpyxl import load_workbook
+            workbook = load_workbook(self.file_path, read_only=True, data_only=True)
+            self._close = workbook.close
+            sheet = workbook[self.sheet_name] if self.sheet_name else workbook.active
+            rows = sheet.iter_rows(values_only=True)
+            self._set_header(next(rows, ()))
+            return rows
+
+        # Legacy formats openpyxl cannot stream
+        import pandas as pd
+        df = pd.read_excel(self.file_path, sheet_name=self.sheet_name or 0)
+        self._set_header(df.columns)
+        return df.itertuples(index=False, name=None)
+
+    def _jsonl_values(self, f):
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            for key in record:
+                if key not in self.columns:
+                    self.columns[key] = len(self.columns)
+            values = [None] * len(self.columns)
+            for key, value in record.items():
+                values[self.columns[key]] = value
+            yield values
+
+    def close(self):
+        if self._close:
+            self._close()
+            self._close = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        line = 1
+        try:
+            for values in self._values:
+                line += 1
+                if all(_is_blank(v) for v in values):
+                    continue
+                yield SheetRow(self.columns, values, line)
+        finally:
+            self.close()
+
+    def missing(self, required):
+        return sorted(set(required) - set(self.columns))
+
+def _is_blank(value):
+    if value is None:
+        return True
+    if isinstance(value, float) and value != value:
+        return True
+    return isinstance(value, str) and not value.strip()
+
+def open_rows(file_path, sheet_name=None, required=()):
+    try:
+        source = RowSource(file_path, sheet_name)
+    except Exception as e:
+        print(f"\n[ERROR] Unable to read file: {e}")
+        return None
+
+    missing = source.missing(required)
+    if missing:
+        source.close()
+        print(f"\n[ERROR] Missing columns in sheet: {', '.join(missing)}")
+        return None
+    return source
+
 def select_option():
     while True:
         clear_screen()
@@ -47,24 +1194,154 @@ def select_option():
         print("1 - Manage Groups")
         print("2 - Manage Users")
         print("3 - Manage Private Apps")
+        print("4 - Export tenant inventory")
         print("0 - Exit")
 
         choice = input("\nChoose a number: ")
 
-        if choice == "1":
-            menu_manage_groups()
-            input("\nPress ENTER to return to the main menu...")
-        elif choice == "2":
-            menu_manage_users()
-            input("\nPress ENTER to return to the main menu...")
-        elif choice == "3":
-            menu_manage_papps()
+        try:
+            if choice == "1":
+                menu_manage_groups()
+                input("\nPress ENTER to return to the main menu...")
+            elif choice == "2":
+                menu_manage_users()
+                input("\nPress ENTER to return to the main menu...")
+            elif choice == "3":
+                menu_manage_papps()
+                input("\nPress ENTER to return to the main menu...")
+            elif choice == "4":
+                export_inventory(directory=input("\nOutput directory (ENTER for default): ").strip() or None,
+                                 fmt=input("Format (jsonl/csv/parquet, ENTER for jsonl): ").strip().lower() or "jsonl")
+                input("\nPress ENTER to return to the main menu...")
+            elif choice == "0":
+                print_connection_stats()
+                close_sessions()
+                print("\n### Script finished ###\n")
+                break
+            else:
+                print("Invalid option!")
+        except ListingError as e:
+            # A listing that could not be read completely aborts the operation, not the tool
+            print(f"\n[ERROR] {e}")
             input("\nPress ENTER to return to the main menu...")
-        elif choice == "0":
-            print("\n### Script finished ###\n")
-            break
-        else:
-            print("Invalid option!")
+
+
+# ----- SCIM IDENTITY CACHE -----
+
+class IdentityCache:
+    # userName/displayName -> id with LRU eviction, TTL and optional SQLite persistence
+
+    def __init__(self, tenant_key, max_size, ttl, path=None):
+        self.tenant_key = tenant_key
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS identities ("
+                "tenant TEXT, kind TEXT, name TEXT, id TEXT, stored_at REAL, "
+                "PRIMARY KEY (tenant, kind, name))"
+            )
+            self.db.commit()
+
+    def _store(self, key, value, stored_at):
+        self.entries[key] = (value, stored_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def get(self, kind, name):
+        key = (kind, name.strip().casefold())
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and now - entry[1] <= self.ttl:
+                self.entries.move_to_end(key)
+                return entry[0]
+            self.entries.pop(key, None)
+            if self.db is None:
+                return None
+            row = self.db.execute(
+                "SELECT id, stored_at FROM identities WHERE tenant = ? AND kind = ? AND name = ?",
+                (self.tenant_key, key[0], key[1])
+            ).fetchone()
+            if row and now - row[1] <= self.ttl:
+                self._store(key, row[0], row[1])
+                return row[0]
+            return None
+
+    def put_many(self, kind, items):
+        now = time.time()
+        rows = []
+        with self.lock:
+            for name, value in items:
+                if not name or not value:
+                    continue
+                key = (kind, str(name).strip().casefold())
+                self._store(key, str(value), now)
+                rows.append((self.tenant_key, key[0], key[1], str(value), now))
+            if self.db is not None and rows:
+                self.db.executemany("INSERT OR REPLACE INTO identities VALUES (?, ?, ?, ?, ?)", rows)
+                self.db.commit()
+
+    def put(self, kind, name, value):
+        self.put_many(kind, [(name, value)])
+
+    def invalidate(self, kind, name=None, value=None):
+        with self.lock:
+            if name is not None:
+                keys = [(kind, name.strip().casefold())]
+            else:
+                keys = [k for k, v in self.entries.items() if k[0] == kind and v[0] == str(value)]
+            for key in keys:
+                self.entries.pop(key, None)
+            if self.db is not None:
+                if name is not None:
+                    self.db.execute("DELETE FROM identities WHERE tenant = ? AND kind = ? AND name = ?",
+                                    (self.tenant_key, kind, name.strip().casefold()))
+                else:
+                    self.db.execute("DELETE FROM identities WHERE tenant = ? AND kind = ? AND id = ?",
+                                    (self.tenant_key, kind, str(value)))
+                self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM identities WHERE tenant = ?", (self.tenant_key,))
+                self.db.commit()
+
+def get_identity_cache():
+    with _identity_caches_lock:
+        cache = _identity_caches.get(tenant_url)
+        if cache is None:
+            cache = IdentityCache(tenant_url, IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL, IDENTITY_CACHE_PATH or None)
+            _identity_caches[tenant_url] = cache
+        return cache
+
+def iter_scim_resources(resource, page_size=None):
+    url = f"{tenant_url}/api/v2/scim/{resource}"
+    count = page_size or PAGE_SIZE
+    start_index = 1
+    while True:
+        r = safe_request("GET", url, params={"startIndex": start_index, "count": count})
+        body = _listing_page(r, f"SCIM {resource}", f"startIndex {start_index}")
+        resources = body.get("Resources") or []
+        yield from resources
+        start_index += len(resources)
+        if not resources or start_index > body.get("totalResults", 0):
+            return
+
+def warm_identity_cache():
+    cache = get_identity_cache()
+    users = [(u.get("userName"), u.get("id")) for u in iter_scim_resources("Users")]
+    cache.put_many("user", users)
+    groups = [(g.get("displayName"), g.get("id")) for g in iter_scim_resources("Groups")]
+    cache.put_many("group", groups)
+    print(f"\n[OK] Identity cache loaded: {len(users)} users, {len(groups)} groups.")
 
 
 # ----- GROUPS -----
@@ -77,6 +1354,8 @@ def menu_manage_groups():
         print("2 - Add group member")
         print("3 - Remove group member")
         print("4 - Search Group ID")
+        print("5 - Refresh SCIM identity cache")
+        print("6 - Bulk group membership from file")
         print("0 - Return to the main menu")
 
         choice = input("\nChoose a number: ")
@@ -93,37 +1372,69 @@ def menu_manage_groups():
         elif choice == "4":
             find_group(input("\nGroup name: "))
             input("\nPress ENTER to return to the menu...")
+        elif choice == "5":
+            get_identity_cache().clear()
+            warm_identity_cache()
+            input("\nPress ENTER to return to the menu...")
+        elif choice == "6":
+            bulk_group_members(file_path=input("\nFile path (CSV/Excel): ").strip(),
+                               sheet_name=input("Sheet name (Excel only): ").strip())
+            input("\nPress ENTER to return to the menu...")
         elif choice == "0":
             break
         else:
             print("Invalid option!")
 
-def create_group():
-    print("\n----- CREATE SCIM GROUP -----")
-    request_url = tenant_url + "/api/v2/scim/Groups"
-    group_name = input("\nGroup name: ")
-
-    data = {
+def scim_group_payload(group_name):
+    return {
         "displayName": group_name,
         "externalId": group_name,
         "schemas": ["urn:ietf:params:scim:schemas:core:2.0:Group"]
     }
 
-    r = safe_request("POST", request_url, headers=scim_header(), json=data)
+def scim_members_patch_payload(members_by_op):
+    return {
+        "Operations": [
+            {
+                "op": op,
+                "path": "members",
+                "value": [{"value": user_id} for user_id in user_ids]
+            }
+            for op, user_ids in members_by_op.items() if user_ids
+        ],
+        "schemas": ["urn:ietf:params:scim:api:messages:2.0:PatchOp"]
+    }
+
+def scim_member_patch_payload(user_ids, op):
+    return scim_members_patch_payload({op: user_ids})
+
+@invalidates("scim_groups")
+def create_group():
+    print("\n----- CREATE SCIM GROUP -----")
+    request_url = tenant_url + "/api/v2/scim/Groups"
+    group_name = input("\nGroup name: ")
+
+    r = safe_request("POST", request_url, json=scim_group_payload(group_name))
     if not r:
         return
 
     if r.status_code == 201:
         resp = r.json()
+        get_identity_cache().put("group", group_name, resp['id'])
         print("\nGroup created successfully!")
         print(f"Name: {resp['displayName']}\nExternal ID: {resp['externalId']}\nID: {resp['id']}")
     else:
         print("\nError:", r.text)
 
 def find_group(group_name):
+    group_id = get_identity_cache().get("group", group_name)
+    if group_id:
+        print(f"\nGroup found! ID: {group_id}")
+        return group_id
+
     request_url = f"{tenant_url}/api/v2/scim/Groups"
     params = {"filter": f"displayName eq {group_name}"}
-    r = safe_request("GET", request_url, headers=scim_header(), params=params)
+    r = safe_request("GET", request_url, params=params)
     if not r:
         return None
 
@@ -133,13 +1444,19 @@ def find_group(group_name):
         print("\nGroup not found!")
     else:
         group_id = r.json()['Resources'][0]['id']
+        get_identity_cache().put("group", group_name, group_id)
         print(f"\nGroup found! ID: {group_id}")
         return group_id
 
 def find_user(user):
+    user_id = get_identity_cache().get("user", user)
+    if user_id:
+        print(f"\nUser found! ID: {user_id}")
+        return user_id
+
     request_url = f"{tenant_url}/api/v2/scim/Users"
     params = {"filter": f"userName eq {user}"}
-    r = safe_request("GET", request_url, headers=scim_header(), params=params)
+    r = safe_request("GET", request_url, params=params)
     if not r:
         return None
 
@@ -149,24 +1466,15 @@ def find_user(user):
         print("\nUser not found!")
     else:
         user_id = r.json()['Resources'][0]['id']
+        get_identity_cache().put("user", user, user_id)
         print(f"\nUser found! ID: {user_id}")
         return user_id
 
+@invalidates("scim_groups")
 def patch_group_member(group_id, user_id, op):
     request_url = f"{tenant_url}/api/v2/scim/Groups/{group_id}"
 
-    data = {
-        "Operations": [
-            {
-                "op": op,
-                "path": "members",
-                "value": [{"value": user_id}]
-            }
-        ],
-        "schemas": ["urn:ietf:params:scim:api:messages:2.0:PatchOp"]
-    }
-
-    r = safe_request("PATCH", request_url, headers=scim_header(), json=data)
+    r = safe_request("PATCH", request_url, json=scim_member_patch_payload([user_id], op))
     if not r:
         return
 
@@ -189,6 +1497,80 @@ def remove_group_member():
     if group_id and user_id:
         patch_group_member(group_id, user_id, "remove")
 
+def _patch_group_members_chunked(group_name, group_id, changes):
+    # changes is a list of (op, user_id); each PATCH carries up to MEMBER_CHUNK_SIZE members
+    request_url = f"{tenant_url}/api/v2/scim/Groups/{group_id}"
+    ok = failed = 0
+    for chunk in _batched(changes, MEMBER_CHUNK_SIZE):
+        members_by_op = {}
+        for op, user_id in chunk:
+            members_by_op.setdefault(op, []).append(user_id)
+        r = safe_request("PATCH", request_url, json=scim_members_patch_payload(members_by_op))
+        if r is not None and r.status_code in (200, 204):
+            ok += len(chunk)
+        else:
+            failed += len(chunk)
+            print(f"\n[FAIL] Group '{group_name}':", r.text if r is not None else "no response")
+    print(f"[OK] Group '{group_name}': {ok} member changes applied, {failed} failed")
+    return ok, failed
+
+@metered("bulk_group_members")
+@invalidates("scim_groups")
+def bulk_group_members(file_path: str, sheet_name: str = None):
+
+    if not file_path:
+        print("\n[INFO] Necessary parameters not found!")
+        return
+
+    rows = open_rows(file_path, sheet_name, required=("Group", "User"))
+    if rows is None:
+        return
+
+    print("\n### STARTING BULK MEMBERSHIP ROUTINE ###")
+    warm_identity_cache()
+    cache = get_identity_cache()
+
+    # Merge every add/remove for the same group; the last operation for a user wins
+    groups: Dict[str, Dict[str, str]] = {}
+    skipped = 0
+    for row in rows:
+        if _is_blank(row["Group"]) or _is_blank(row["User"]):
+            print(f"[WARN] Line {row.line}: 'Group' and 'User' are required, skipping.")
+            skipped += 1
+            continue
+        group_name = str(row["Group"]).strip()
+        user = str(row["User"]).strip()
+        op = str(row.get("Operation", "add")).strip().lower()
+        if op not in ("add", "remove"):
+            print(f"[WARN] Invalid operation '{op}' for user '{user}', skipping.")
+            skipped += 1
+            continue
+        groups.setdefault(group_name, {})[user] = op
+
+    jobs = []
+    for group_name, members in groups.items():
+        group_id = cache.get("group", group_name) or find_group(group_name)
+        if not group_id:
+            print(f"[WARN] Group '{group_name}' not found, skipping {len(members)} changes.")
+            skipped += len(members)
+            continue
+        changes = []
+        for user, op in members.items():
+            user_id = cache.get("user", user) or find_user(user)
+            if user_id:
+                changes.append((op, user_id))
+            else:
+                print(f"[WARN] User '{user}' not found, skipping.")
+                skipped += 1
+        if changes:
+            jobs.append((group_name, group_id, changes))
+
+    results = list(run_concurrent(lambda job: _patch_group_members_chunked(*job), jobs, BULK_CONCURRENCY))
+    applied = sum(ok for ok, _ in results)
+    failed = sum(f for _, f in results)
+    print(f"\nBulk membership finished: {applied} changes applied, {failed} failed across {len(jobs)} groups.")
+    return {"applied": applied, "skipped": skipped, "failed": failed + skipped}
+
 
 # ----- USERS -----
 
@@ -199,6 +1581,7 @@ def menu_manage_users():
         print("1 - Search User ID")
         print("2 - Create SCIM User")
         print("3 - Delete SCIM User")
+        print("4 - Bulk provision users from file")
         print("0 - Return to the main menu")
 
         choice = input("\nChoose a number: ")
@@ -211,33 +1594,32 @@ def menu_manage_users():
         elif choice == "3":
             delete_scim_user(find_user(input("\nUsername: ")))
             input("\nPress ENTER to return to the menu...")
+        elif choice == "4":
+            bulk_provision_users(file_path=input("\nFile path (CSV/Excel/JSONL): ").strip(),
+                                 sheet_name=input("Sheet name (Excel only): ").strip())
+            input("\nPress ENTER to return to the menu...")
         elif choice == "0":
             break
         else:
             print("Invalid option!")
 
+@invalidates("scim_users", "scim_groups")
 def delete_scim_user(user_id):
     
     request_url = tenant_url + "/api/v2/scim/Users/"+user_id
 
-    r = safe_request("DELETE", request_url, headers=scim_header())
+    r = safe_request("DELETE", request_url)
     if not r:
         return
 
     if r.status_code == 204:
+        get_identity_cache().invalidate("user", value=user_id)
         print("\nUser deleted successfully!")
     else:
         print("\nError:", r.text)
 
-def create_scim_user():
-    
-    print("\n----- CREATE SCIM USER -----")
-    request_url = tenant_url + "/api/v2/scim/Users"
-    first_name = input("\nFirst Name: ")
-    last_name = input("Last Name: ")
-    username = input("Username (UPN/Email): ")
-    
-    data = {
+def scim_user_payload(first_name, last_name, username):
+    return {
     "active": "true",
     "emails": [
         {
@@ -261,15 +1643,200 @@ def create_scim_user():
     "userName": username
     }
 
-    r = safe_request("POST", request_url, headers=scim_header(), json=data)
+@invalidates("scim_users")
+def create_scim_user():
+    
+    print("\n----- CREATE SCIM USER -----")
+    request_url = tenant_url + "/api/v2/scim/Users"
+    first_name = input("\nFirst Name: ")
+    last_name = input("Last Name: ")
+    username = input("Username (UPN/Email): ")
+
+    r = safe_request("POST", request_url, json=scim_user_payload(first_name, last_name, username))
     if not r:
         return
 
     if r.status_code == 201:
+        get_identity_cache().invalidate("user", name=username)
+        get_identity_cache().put("user", username, r.json().get("id"))
         print("\nUser created successfully!")
     else:
         print("\nError:", r.text)
 
+def _read_user_records(file_path, sheet_name=None):
+    rows = open_rows(file_path, sheet_name)
+    if rows is None:
+        return None
+    try:
+        return [{k: v for k, v in row.to_dict().items() if not _is_blank(v)} for row in rows]
+    except (OSError, ValueError) as e:
+        print(f"\n[ERROR] Unable to read file: {e}")
+        return None
+
+def scim_bulk_support():
+    # Bulk capabilities advertised by the tenant, or None when /Bulk is not supported
+    with _scim_bulk_lock:
+        if tenant_url in _scim_bulk_support:
+            return _scim_bulk_support[tenant_url]
+        support = None
+        r = safe_request("GET", f"{tenant_url}/api/v2/scim/ServiceProviderConfig")
+        if r is not None and r.status_code == 200:
+            try:
+                bulk = r.json().get("bulk") or {}
+            except ValueError:
+                bulk = {}
+            if bulk.get("supported") in (True, "true"):
+                support = {"max_operations": int(bulk.get("maxOperations") or SCIM_BULK_OPERATIONS)}
+        _scim_bulk_support[tenant_url] = support
+        return support
+
+def _bulk_status(operation):
+    status = operation.get("status")
+    if isinstance(status, dict):
+        status = status.get("code")
+    try:
+        return int(str(status).split()[0])
+    except (TypeError, ValueError):
+        return 0
+
+def _user_operation(record, index):
+    username = str(record.get("Username") or record.get("userName") or "").strip()
+    op = str(record.get("Operation") or "create").strip().lower()
+    return {
+        "index": index,
+        "bulk_id": f"user-{index}",
+        "username": username,
+        "op": op,
+        "first_name": str(record.get("First Name") or record.get("givenName") or ""),
+        "last_name": str(record.get("Last Name") or record.get("familyName") or ""),
+    }
+
+def _send_bulk_users(operations):
+    cache = get_identity_cache()
+    body = {
+        "schemas": ["urn:ietf:params:scim:api:messages:2.0:BulkRequest"],
+        "Operations": []
+    }
+    if SCIM_BULK_FAIL_ON_ERRORS > 0:
+        body["failOnErrors"] = SCIM_BULK_FAIL_ON_ERRORS
+    for item in operations:
+        if item["op"] == "create":
+            body["Operations"].append({
+                "method": "POST",
+                "path": "/Users",
+                "bulkId": item["bulk_id"],
+                "data": scim_user_payload(item["first_name"], item["last_name"], item["username"])
+            })
+        else:
+            body["Operations"].append({
+                "method": "DELETE",
+                "path": f"/Users/{item['user_id']}",
+                "bulkId": item["bulk_id"]
+            })
+
+    r = safe_request("POST", f"{tenant_url}/api/v2/scim/Bulk", json=body, timeout=BULK_TIMEOUT)
+    if r is None or r.status_code not in (200, 201):
+        error = r.text if r is not None else "no response"
+        return [dict(item, status=r.status_code if r is not None else 0, ok=False, error=error) for item in operations]
+
+    try:
+        responses = r.json().get("Operations", []) or []
+    except (ValueError, AttributeError):
+        # The batch may or may not have been applied; it is reported as failed
+        return [dict(item, status=r.status_code, ok=False, error="invalid JSON in bulk response")
+                for item in operations]
+    by_bulk_id = {op.get("bulkId"): op for op in responses}
+    results = []
+    for position, item in enumerate(operations):
+        response = by_bulk_id.get(item["bulk_id"])
+        if response is None and position < len(responses):
+            response = responses[position]
+        status = _bulk_status(response or {})
+        ok = status in (200, 201, 204)
+        if ok and item["op"] == "create":
+            location = (response or {}).get("location") or ""
+            cache.put("user", item["username"], location.rstrip("/").rsplit("/", 1)[-1])
+        elif ok:
+            cache.invalidate("user", value=item["user_id"])
+        results.append(dict(item, status=status, ok=ok, error=None if ok else (response or {}).get("response")))
+    return results
+
+def _send_single_user(item):
+    cache = get_identity_cache()
+    if item["op"] == "create":
+        r = safe_request("POST", f"{tenant_url}/api/v2/scim/Users",
+                         json=scim_user_payload(item["first_name"], item["last_name"], item["username"]))
+        ok = r is not None and r.status_code == 201
+        if ok:
+            cache.put("user", item["username"], r.json().get("id"))
+    else:
+        r = safe_request("DELETE", f"{tenant_url}/api/v2/scim/Users/{item['user_id']}")
+        ok = r is not None and r.status_code == 204
+        if ok:
+            cache.invalidate("user", value=item["user_id"])
+    status = r.status_code if r is not None else 0
+    return dict(item, status=status, ok=ok, error=None if ok or r is None else r.text)
+
+@metered("bulk_provision_users")
+@invalidates("scim_users", "scim_groups")
+def bulk_provision_users(file_path: str, sheet_name: str = None):
+
+    if not file_path:
+        print("\n[INFO] Necessary parameters not found!")
+        return
+
+    records = _read_user_records(file_path, sheet_name)
+    if records is None:
+        return
+
+    print("\n### STARTING BULK USER PROVISIONING ###")
+    started = time.monotonic()
+    operations = []
+    results = []
+    for index, record in enumerate(records):
+        item = _user_operation(record, index)
+        if not item["username"] or item["op"] not in ("create", "delete"):
+            results.append(dict(item, status=0, ok=False, error="invalid row"))
+        else:
+            operations.append(item)
+
+    if any(item["op"] == "delete" for item in operations):
+        warm_identity_cache()
+        cache = get_identity_cache()
+        resolved = []
+        for item in operations:
+            if item["op"] == "delete":
+                item["user_id"] = cache.get("user", item["username"])
+                if not item["user_id"]:
+                    results.append(dict(item, status=404, ok=False, error="user not found"))
+                    continue
+            resolved.append(item)
+        operations = resolved
+
+    support = scim_bulk_support()
+    if support:
+        size = max(1, min(SCIM_BULK_OPERATIONS, support["max_operations"]))
+        print(f"\n[INFO] SCIM Bulk supported, sending {size} operations per request.")
+        for batch_results in run_concurrent(_send_bulk_users, list(_batched(operations, size)), BULK_CONCURRENCY):
+            results.extend(batch_results)
+    else:
+        print("\n[INFO] SCIM Bulk not supported, falling back to concurrent per-user requests.")
+        results.extend(run_concurrent(_send_single_user, operations, BULK_CONCURRENCY))
+
+    results.sort(key=lambda item: item["index"])
+    for item in results:
+        if item["ok"]:
+            print(f"[OK] {item['op']} {item['username']} ({item['status']})")
+        else:
+            print(f"[FAIL] {item['op']} {item['username']} ({item['status']}): {item['error']}")
+
+    elapsed = time.monotonic() - started
+    succeeded = sum(1 for item in results if item["ok"])
+    rate = len(results) / elapsed if elapsed else 0.0
+    print(f"\nBulk provisioning finished: {succeeded}/{len(results)} operations succeeded "
+          f"in {elapsed:.1f}s ({rate:.1f} ops/s).")
+    return {"operations": len(results), "succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
 # ----- PRIVATE APPS -----
 
 def menu_manage_papps():
@@ -281,6 +1848,8 @@ def menu_manage_papps():
         print("3 - Remove Private Apps")
         print("4 - Create Private Apps from Excel")
         print("5 - Create Private App policies from Excel")
+        print("6 - Reconcile Private Apps from Excel (plan/apply)")
+        print("7 - Deploy Private App policies from Excel (batch, ordered)")
         print("0 - Return to the main menu")
 
         choice = input("\nChoose a number: ")
@@ -300,11 +1869,39 @@ def menu_manage_papps():
         elif choice == "5":
             create_papp_policy(file_path=input("\nFile path: "),sheet_name=input("Sheet name: "))
             input("\nPress ENTER to return to the menu...")
+        elif choice == "6":
+            file_path = input("\nFile path: ")
+            sheet_name = input("Sheet name: ")
+            prune = input("Delete apps with the sheet's suffixes that are not in the sheet? (y/N): ").strip().lower() == "y"
+            plan = reconcile_apps(file_path, sheet_name, prune=prune)
+            if plan and (plan["create"] or plan["update"] or plan["delete"]):
+                if input("\nApply this plan? (y/N): ").strip().lower() == "y":
+                    apply_app_plan(plan)
+            input("\nPress ENTER to return to the menu...")
+        elif choice == "7":
+            deploy_policies(file_path=input("\nFile path: "),sheet_name=input("Sheet name: "))
+            input("\nPress ENTER to return to the menu...")
         elif choice == "0":
             break
         else:
             print("Invalid option!")
 
+def select_papps_by_prefix(action):
+    # Asks for a name prefix and returns the matching app IDs once the user confirms
+    prefix = input("\nPrivate Apps starts with: ").strip()
+    if not prefix:
+        print("\n[ERROR] Enter the start of the Private App names; an empty prefix is not accepted.")
+        return []
+    ids = list(get_papps(prefix))
+    if not ids:
+        print(f"\n[INFO] No Private Apps start with '{prefix}'.")
+        return []
+    print(f"\n{len(ids)} Private Apps start with '{prefix}'.")
+    if input(f"{action} these {len(ids)} Private Apps? (y/N): ").strip().lower() != "y":
+        print("\n[INFO] Cancelled.")
+        return []
+    return ids
+
 def menu_remove_papps():
     while True:
         clear_screen()
@@ -316,10 +1913,12 @@ def menu_remove_papps():
         choice = input("\nChoose a number: ")
 
         if choice == "1":
-            papps_delete(get_papps(input("\nPrivate Apps starts with: ")))
+            ids = select_papps_by_prefix("Remove")
+            if ids:
+                papps_delete(ids)
             input("\nPress ENTER to return to the Private Apps menu...")
         elif choice == "2":
-            papps_delete(get_all_papps())
+            papps_delete(get_all_papps(consuming=True))
             input("\nPress ENTER to return to the Private Apps menu...")
         elif choice == "0":
             break
@@ -333,6 +1932,7 @@ def menu_manage_tags():
         print("1 - Apply tags from Excel (per host)")
         print("2 - Remove tags from Private Apps that start with")
         print("3 - Remove tags from all Private Apps")
+        print("4 - Apply tags from Excel (bulk)")
         print("0 - Return to the main menu")
 
         choice = input("\nChoose a number: ")
@@ -341,10 +1941,15 @@ def menu_manage_tags():
             papps_tags_from_excel()
             input("\nPress ENTER to return to the Private Apps menu...")
         elif choice == "2":
-            papps_tags_delete(get_papps(input("\nPrivate Apps starts with: ")))
+            ids = select_papps_by_prefix("Remove the tags from")
+            if ids:
+                papps_tags_delete(ids)
             input("\nPress ENTER to return to the Private Apps menu...")
         elif choice == "3":
-            papps_delete(get_all_papps())
+            papps_tags_delete(get_all_papps())
+            input("\nPress ENTER to return to the Private Apps menu...")
+        elif choice == "4":
+            papps_tags_from_excel_bulk()
             input("\nPress ENTER to return to the Private Apps menu...")
         elif choice == "0":
             break
@@ -379,45 +1984,268 @@ def menu_manage_publishers():
         else:
             print("Invalid option!")
 
-def get_all_papps():
-    r = safe_request("GET", f"{tenant_url}/api/v2/steering/apps/private", headers=api_header())
-    if not r:
-        return []
-    return [app['app_id'] for app in r.json().get('data', {}).get('private_apps', [])]
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_private_apps(query=None, fields=None, page_size=None, consuming=False):
+    url = f"{tenant_url}/api/v2/steering/apps/private"
+    limit = page_size or PAGE_SIZE
+
+    def fetch(offset):
+        params = {"limit": limit, "offset": offset}
+        if query:
+            params["query"] = query
+        if fields:
+            params["fields"] = fields
+        r = safe_request("GET", url, params=params)
+        return _listing_page(r, "Private Apps", f"offset {offset}").get('data', {}).get('private_apps', []) or []
+
+    if consuming:
+        # The caller removes what it receives, so the next batch is always at offset 0
+        previous = None
+        while True:
+            page = fetch(0)
+            if not page:
+                return
+            ids = [app.get('app_id') for app in page]
+            if ids == previous:
+                print("\n[WARN] Private Apps were not removed, stopping.")
+                return
+            previous = ids
+            yield from page
+            if len(page) < limit:
+                return
+
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        offset = 0
+        future = prefetcher.submit(fetch, offset)
+        while True:
+            page = future.result()
+            if not page:
+                return
+            offset += len(page)
+            if len(page) < limit:
+                yield from page
+                return
+            future = prefetcher.submit(fetch, offset)
+            yield from page
+
+def _app_hosts(app):
+    hosts = app.get("host") or []
+    if isinstance(hosts, str):
+        hosts = hosts.split(",")
+    return [host.strip().casefold() for host in hosts if host and host.strip()]
+
+def _ngrams(text, size=3):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+class AppIndex:
+    # Offline lookups over the private app inventory: a sorted name array for prefixes,
+    # an exact host map and a trigram index for substring queries. sync() only applies
+    # the apps added, changed or removed since the inventory it last saw.
+
+    def __init__(self):
+        self.apps = {}
+        self.names = []
+        self.hosts = {}
+        self.grams = {}
+        self.source = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _keys(app):
+        name = str(app.get("app_name") or "").casefold()
+        hosts = _app_hosts(app)
+        return name, hosts, _ngrams(name).union(*(_ngrams(host) for host in hosts))
+
+    def _add(self, app_id, app):
+        name, hosts, grams = self._keys(app)
+        self.apps[app_id] = app
+        bisect.insort(self.names, (name, app_id))
+        for host in hosts:
+            self.hosts.setdefault(host, set()).add(app_id)
+        for gram in grams:
+            self.grams.setdefault(gram, set()).add(app_id)
+
+    def _remove(self, app_id):
+        name, hosts, grams = self._keys(self.apps.pop(app_id))
+        position = bisect.bisect_left(self.names, (name, app_id))
+        if position < len(self.names) and self.names[position] == (name, app_id):
+            del self.names[position]
+        for key, table in [(host, self.hosts) for host in hosts] + [(gram, self.grams) for gram in grams]:
+            ids = table.get(key)
+            if ids is not None:
+                ids.discard(app_id)
+                if not ids:
+                    del table[key]
+
+    def sync(self, apps):
+        # The snapshot keeps unchanged records as the same objects, so identity tells what changed
+        with self.lock:
+            if apps is self.source:
+                return
+            seen = set()
+            for app in apps:
+                app_id = str(app.get("app_id"))
+                seen.add(app_id)
+                current = self.apps.get(app_id)
+                if current is app:
+                    continue
+                if current is not None:
+                    self._remove(app_id)
+                self._add(app_id, app)
+            for app_id in [app_id for app_id in self.apps if app_id not in seen]:
+                self._remove(app_id)
+            self.source = apps
+
+    def _result(self, ids):
+        # (matches sorted by name, ambiguous)
+        matches = sorted((self.apps[app_id] for app_id in ids),
+                         key=lambda app: (str(app.get("app_name") or "").casefold(), str(app.get("app_id"))))
+        return matches, len(matches) > 1
+
+    def prefix(self, text):
+        # Case-sensitive like the API's 'name sw' query; the folded array narrows the
+        # candidates. A blank prefix matches nothing rather than every app.
+        text = text.strip()
+        if not text:
+            return [], False
+        folded = text.casefold()
+        with self.lock:
+            ids = []
+            position = bisect.bisect_left(self.names, (folded,))
+            while position < len(self.names) and self.names[position][0].startswith(folded):
+                app_id = self.names[position][1]
+                if str(self.apps[app_id].get("app_name") or "").startswith(text):
+                    ids.append(app_id)
+                position += 1
+            return self._result(ids)
+
+    def by_host(self, host):
+        with self.lock:
+            return self._result(self.hosts.get(host.strip().casefold(), ()))
+
+    def search(self, text):
+        # Exact host first, otherwise the text anywhere in the name or a host,
+        # the same match as the API's 'name has' query
+        text = text.strip().casefold()
+        with self.lock:
+            ids = self.hosts.get(text)
+            if not ids:
+                if len(text) >= 3:
+                    candidates = sorted((self.grams.get(gram, set()) for gram in _ngrams(text)), key=len)
+                    candidates = set.intersection(*candidates) if candidates[0] else set()
+                else:
+                    candidates = self.apps
+                ids = [app_id for app_id in candidates if self._contains(self.apps[app_id], text)]
+            return self._result(ids)
+
+    @staticmethod
+    def _contains(app, text):
+        return text in str(app.get("app_name") or "").casefold() or any(text in host for host in _app_hosts(app))
+
+def app_index(max_age=None):
+    apps = inventory("private_apps", max_age)
+    with _app_indexes_lock:
+        index = _app_indexes.setdefault(tenant_url, AppIndex())
+    index.sync(apps)
+    return index
+
+def get_all_papps(consuming=False):
+    for app in iter_private_apps(fields="app_id", consuming=consuming):
+        yield app['app_id']
 
 def get_papps(startswith):
-    r = safe_request("GET", f"{tenant_url}/api/v2/steering/apps/private?fields=app_id%2Capp_name&query=name%20sw%20{startswith}", headers=api_header())
-    if not r:
-        return []
-    return [app['app_id'] for app in r.json().get('data', {}).get('private_apps', [])]
+    # Served from the app index after an incremental refresh, since callers change what they receive
+    matches, _ = app_index(max_age=0).prefix(startswith)
+    for app in matches:
+        yield app['app_id']
 
 def publisher_check():
-    r = safe_request("GET", f"{tenant_url}/api/v2/infrastructure/publishers", headers=api_header())
-    if not r:
+    catalogue = get_publisher_catalogue()
+    if not catalogue:
         return []
 
-    if r.status_code == 200:
-        print("\nPublishers found:\n")
-        publishers = r.json()['data']['publishers']
-        for idx, pub in enumerate(publishers):
-            print(f"{idx} - {pub['publisher_name']}")
+    print("\nPublishers found:\n")
+    publishers = catalogue["publishers"]
+    for idx, pub in enumerate(publishers):
+        print(f"{idx} - {pub['publisher_name']}")
+
+    choice = input("\nChoose publishers (comma separated): ")
+    indices = [int(i) for i in choice.split(",") if i.strip().isdigit()]
+    return [publishers[i]['publisher_id'] for i in indices if 0 <= i < len(publishers)]
+
+def run_chunked(method, url, ids, build_payload, chunk_size=None, concurrency=None, retries=None):
+    # Splits ids into chunks sent in parallel; only failed chunks are retried
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    concurrency = concurrency or BULK_CONCURRENCY
+    retries = BULK_RETRIES if retries is None else retries
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+    def send(index):
+        started = time.monotonic()
+        r = safe_request(method, url, json=build_payload(chunks[index]), timeout=BULK_TIMEOUT)
+        ok = False
+        if r is not None:
+            try:
+                ok = r.json().get("status") == "success"
+            except ValueError:
+                ok = False
+        return ok, time.monotonic() - started, r
+
+    done = [False] * len(chunks)
+    pending = list(range(len(chunks)))
+    attempt = 0
+    while pending and attempt <= retries:
+        failed = []
+        for index, (ok, latency, r) in zip(pending, run_concurrent(send, pending, concurrency)):
+            label = "OK" if ok else "FAIL"
+            retry = f" | retry {attempt}" if attempt else ""
+            print(f"[{label}] Chunk {index + 1}/{len(chunks)} | {len(chunks[index])} ids | {latency * 1000:.0f} ms{retry}")
+            if ok:
+                done[index] = True
+            else:
+                failed.append(index)
+                if r is not None:
+                    print("Failure:", r.text)
+        pending = failed
+        attempt += 1
 
-        choice = input("\nChoose publishers (comma separated): ")
-        indices = [int(i) for i in choice.split(",") if i.strip().isdigit()]
-        return [publishers[i]['publisher_id'] for i in indices if 0 <= i < len(publishers)]
-    else:
-        print("Error:", r.text)
-        return []
+    return {
+        "chunks": len(chunks),
+        "chunks_ok": sum(done),
+        "ids": len(ids),
+        "ids_ok": sum(len(chunk) for chunk, ok in zip(chunks, done) if ok),
+    }
+
+def _add_summary(total, summary):
+    for key, value in summary.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+def _print_summary(label, summary):
+    if not summary.get("ids"):
+        print("\n[INFO] No Private Apps found.")
+        return
+    print(f"\n{label}: {summary['ids_ok']}/{summary['ids']} Private Apps "
+          f"({summary['chunks_ok']}/{summary['chunks']} chunks succeeded)")
 
+@metered("publisher_bulk")
+@invalidates("private_apps")
 def publisher_bulk(action):
-    private_apps = [str(x) for x in get_all_papps()]
     publishers = [str(x) for x in publisher_check()]
 
-    if not private_apps or not publishers:
+    if not publishers:
         print("\n[INFO] No apps or publishers selected.")
         return
 
-    data = {"private_app_ids": private_apps, "publisher_ids": publishers}
     url = f"{tenant_url}/api/v2/steering/apps/private/publishers"
 
     method_map = {
@@ -426,19 +2254,17 @@ def publisher_bulk(action):
         "delete": "DELETE"
     }
 
-    r = safe_request(method_map[action], url, headers=api_header(), json=data)
-    if not r:
-        return
+    summary = {}
+    for private_apps in _batched((str(x) for x in get_all_papps()), PAGE_SIZE):
+        _add_summary(summary, run_chunked(
+            method_map[action], url, private_apps,
+            lambda chunk: {"private_app_ids": chunk, "publisher_ids": publishers}))
 
-    status = r.json().get("status")
-    if status == "success":
-        print(f"\nPublishers {action} successfully!")
-    else:
-        print("\nFailure:", r.text)
+    _print_summary(f"Publishers {action}", summary)
 
 def get_all_papps_tags():
     url = f"{tenant_url}/api/v2/steering/apps/private/tags"
-    r = safe_request("GET", url, headers=api_header())
+    r = safe_request("GET", url)
     if not r:
         return
     
@@ -449,60 +2275,37 @@ def get_all_papps_tags():
 
     return(tags)
 
-def papps_tags_delete(private_apps):
-    private_apps = [str(x) for x in private_apps]
-
-    if not private_apps:
-        print("\n[INFO] No Private Apps found.")
-        return
-
+def _papps_tags_delete_batch(private_apps, tags):
     url = f"{tenant_url}/api/v2/steering/apps/private/tags"
+    return run_chunked("DELETE", url, private_apps, lambda chunk: {"ids": chunk, "tags": tags})
 
-    tags_temp = get_all_papps_tags()
-
-    tags = []
-
-    for tag in tags_temp:
-        tags.append({"tag_name": tag})
-
-    data = {
-        "ids": private_apps,
-        "tags": tags
-        }
+@metered("papps_tags_delete")
+@invalidates("private_apps")
+def papps_tags_delete(private_apps):
+    tags = [{"tag_name": tag} for tag in get_all_papps_tags() or []]
 
-    r = safe_request("DELETE", url, headers=api_header(), json=data)
+    summary = {}
+    for batch in _batched((str(x) for x in private_apps), PAGE_SIZE):
+        _add_summary(summary, _papps_tags_delete_batch(batch, tags))
 
-    if not r:
-        return
-    status = r.json().get("status")
-    if status == "success":
-        print(f"\nTags deleted successfully!")
-    else:
-        print("\nFailure:", r.text)
+    _print_summary("Tags deleted", summary)
 
+@metered("papps_delete")
+@invalidates("private_apps")
 def papps_delete(private_apps):
-    private_apps = [str(x) for x in private_apps]
-
-    papps_tags_delete(private_apps)
-
-    if not private_apps:
-        print("\n[INFO] No Private Apps found.")
-        return
-
-    data = {"private_app_ids": private_apps}
+    tags = [{"tag_name": tag} for tag in get_all_papps_tags() or []]
 
     url = f"{tenant_url}/api/v2/steering/apps/private"
 
+    tags_summary = {}
+    summary = {}
+    for batch in _batched((str(x) for x in private_apps), PAGE_SIZE):
+        _add_summary(tags_summary, _papps_tags_delete_batch(batch, tags))
+        _add_summary(summary, run_chunked("DELETE", url, batch, lambda chunk: {"private_app_ids": chunk}))
 
-    r = safe_request("DELETE", url, headers=api_header(), json=data)
-
-    if not r:
-        return
-    status = r.json().get("status")
-    if status == "success":
-        print(f"\nPrivate Apps removed successfully!")
-    else:
-        print("\nFailure:", r.text)
+    if tags_summary:
+        _print_summary("Tags deleted", tags_summary)
+    _print_summary("Private Apps removed", summary)
 
 
 # ----- PRIVATE APPS TAGS -----
@@ -520,30 +2323,19 @@ def _clean_tags(raw: str) -> List[Dict[str, str]]:
     return out
 
 
-def _get_private_app_id_by_host(host: str) -> Optional[str]:
+def _get_private_app_id_by_host(host: str, index=None) -> Optional[str]:
 
-    url = f"{tenant_url}/api/v2/steering/apps/private"
-    params = {"query": f'name has "{host}"', "silent": "0"}
-    r = safe_request("GET", url, headers=api_header(), params=params)
-    if not r:
-        return None
-
-    try:
-        j = r.json()
-    except ValueError:
-        print(f"\n[WARN] Invalid JSON searching host '{host}'.")
-        return None
-
-    if j.get("status") != "success":
-        print(f"\n[WARN] Non-success for host '{host}': {j.get('status')}")
-        return None
-
-    apps = j.get("data", {}).get("private_apps", []) or []
-    if not apps:
+    # Callers resolving many hosts pass an index refreshed once per run
+    index = index or app_index(max_age=0)
+    matches, ambiguous = index.search(host)
+    if not matches:
         print(f"\n[WARN] App not found for host '{host}'.")
         return None
+    if ambiguous:
+        print(f"\n[WARN] Host '{host}' matches {len(matches)} apps: {_describe_apps(matches)}")
+        return None
 
-    app = apps[0]
+    app = matches[0]
     app_id = app.get("app_id")
     app_name = app.get("app_name")
     if app_id:
@@ -566,7 +2358,7 @@ def _apply_tags_to_ids(ids: List[str], tags: List[Dict[str, str]]) -> bool:
     url = f"{tenant_url}/api/v2/steering/apps/private/tags"
     payload = {"ids": ids, "tags": tags}
 
-    r = safe_request("PATCH", url, headers=api_header(), json=payload)
+    r = safe_request("PATCH", url, json=payload)
     if not r:
         return False
 
@@ -590,302 +2382,1253 @@ def _apply_tags_to_ids(ids: List[str], tags: List[Dict[str, str]]) -> bool:
     return False
 
 
-def papps_tags_from_excel():
+def _read_tags_sheet(file_path=None, sheet_name=None):
 
-    print("\n----- APPLY TAGS FROM EXCEL (PER HOST) -----")
-    file_path = input("\nExcel file path: ").strip()
-    sheet_name = input("Sheet name: ").strip()
+    if file_path is None:
+        file_path = input("\nExcel file path: ").strip()
+        sheet_name = input("Sheet name: ").strip()
 
-    try:
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
-    except Exception as e:
-        print(f"\n[ERROR] Unable to read Excel: {e}")
-        return
+    return open_rows(file_path, sheet_name, required=("Host", "Tag"))
 
-    required = {"Host", "Tag"}
-    missing = required - set(df.columns)
-    if missing:
-        print(f"\n[ERROR] Missing columns in sheet: {', '.join(sorted(missing))}")
+
+@metered("papps_tags_from_excel")
+@invalidates("private_apps")
+def papps_tags_from_excel(file_path: str = None, sheet_name: str = None):
+
+    print("\n----- APPLY TAGS FROM EXCEL (PER HOST) -----")
+    rows = _read_tags_sheet(file_path, sheet_name)
+    if rows is None:
         return
 
     print("\n### STARTING TAG ROUTINE ###")
-    for _, row in df.iterrows():
+    index = app_index(max_age=0)
+    summary = {"rows": 0, "tagged": 0, "failed": 0}
+    for row in rows:
         host = str(row["Host"]).strip()
         tags = _clean_tags(row["Tag"])
+        summary["rows"] += 1
 
         print(f"\nHost = {host}")
-        app_id = _get_private_app_id_by_host(host)
-        if app_id:
-            _apply_tags_to_ids([app_id], tags)
-        else:
+        app_id = _get_private_app_id_by_host(host, index)
+        if app_id and _apply_tags_to_ids([app_id], tags):
+            summary["tagged"] += 1
+            continue
+        if not app_id:
             print("[WARN] Skipping tag application (app not found).")
+        summary["failed"] += 1
 
-# ----- PRIVATE APPS CREATION -----
+    print(f"\nTags applied: {summary['tagged']}/{summary['rows']} hosts")
+    return summary
 
-def publisher_validation():
 
-    url = f"{tenant_url}/api/v2/infrastructure/publishers?fields=publisher_id%2Cpublisher_name"
+def _describe_apps(apps, limit=5):
+    names = ", ".join(f"{app.get('app_name')} ({app.get('app_id')})" for app in apps[:limit])
+    return names + (f" and {len(apps) - limit} more" if len(apps) > limit else "")
 
-    r = safe_request("GET", url, headers=api_header())
 
-    if not r:
+@metered("papps_tags_from_excel_bulk")
+@invalidates("private_apps")
+def papps_tags_from_excel_bulk(file_path: str = None, sheet_name: str = None):
+
+    print("\n----- APPLY TAGS FROM EXCEL (BULK) -----")
+    rows = _read_tags_sheet(file_path, sheet_name)
+    if rows is None:
         return
-    
-    publishers = r.json()['data']['publishers']
 
-    status = r.json().get("status")
+    print("\n### STARTING BULK TAG ROUTINE ###")
+    index = app_index(max_age=0)
+    print(f"\n[INFO] {len(index.hosts)} hosts indexed from the Private App inventory.")
 
-    if status == "success":
-        return publishers
-    else:
-        print("\nFailure:", r.text)
+    # Rows sharing the same tag set are applied with a single PATCH
+    groups: Dict[tuple, Dict[str, list]] = {}
+    summary = {"rows": 0, "tagged": 0, "failed": 0}
+    for row in rows:
+        host = str(row["Host"]).strip()
+        tags = _clean_tags(row["Tag"])
+        summary["rows"] += 1
+        matches, ambiguous = index.by_host(host)
+        if not matches:
+            print(f"[WARN] App not found for host '{host}'.")
+            summary["failed"] += 1
+            continue
+        if ambiguous:
+            print(f"[WARN] Host '{host}' matches {len(matches)} apps: {_describe_apps(matches)}")
+            summary["failed"] += 1
+            continue
+        if not tags:
+            print(f"[WARN] No valid tags for host '{host}'.")
+            summary["failed"] += 1
+            continue
+        key = tuple(t["tag_name"] for t in tags)
+        group = groups.setdefault(key, {"tags": tags, "ids": []})
+        app_id = str(matches[0]["app_id"])
+        group["rows"] = group.get("rows", 0) + 1
+        if app_id not in group["ids"]:
+            group["ids"].append(app_id)
+
+    for group in groups.values():
+        ids = group["ids"]
+        ok = all([_apply_tags_to_ids(ids[i:i + TAG_BATCH_SIZE], group["tags"])
+                  for i in range(0, len(ids), TAG_BATCH_SIZE)])
+        summary["tagged" if ok else "failed"] += group["rows"]
+
+    print(f"\nTags applied: {summary['tagged']}/{summary['rows']} rows")
+    return summary
 
-def create_apps(file_path: str, sheet_name: str):
+# ----- PRIVATE APPS CREATION -----
+
+def get_publisher_catalogue(refresh=False):
+    # Fetched once per tenant and reused until the TTL expires or a refresh is requested
+    with _publisher_catalogues_lock:
+        catalogue = _publisher_catalogues.get(tenant_url)
+        expired = catalogue is None or time.monotonic() - catalogue["fetched"] > PUBLISHER_CACHE_TTL
+        if refresh or expired:
+            try:
+                publishers = inventory("publishers", max_age=0 if refresh else PUBLISHER_CACHE_TTL)
+            except ListingError as e:
+                print(f"\n[ERROR] {e}")
+                return catalogue
+            if not publishers:
+                return catalogue
+            catalogue = {
+                "fetched": time.monotonic(),
+                "publishers": publishers,
+                "by_name": {p['publisher_name']: p for p in publishers},
+                "by_folded": {p['publisher_name'].strip().casefold(): p for p in publishers},
+            }
+            _publisher_catalogues[tenant_url] = catalogue
+        return catalogue
+
+def find_publisher(name):
+    catalogue = get_publisher_catalogue()
+    if not catalogue:
+        return None
+    publisher = catalogue["by_name"].get(name)
+    if publisher is None:
+        publisher = catalogue["by_folded"].get(name.strip().casefold())
+    return publisher
+
+APP_REQUIRED_COLUMNS = ("Name", "Host", "Publisher", "Port", "Suffix", "Access Type")
+APP_OPTIONAL_COLUMNS = ("Tag", "AnyApp Protocol", "Use Publisher DNS")
+ACCESS_TYPES = ("Client", "Browser")
+
+def sheet_frame(rows):
+    # Materialises a RowSource into a DataFrame indexed by the sheet line number
+    import pandas as pd
+    records = []
+    lines = []
+    for row in rows:
+        records.append(row.values)
+        lines.append(row.line)
+    columns = list(rows.columns)
+    padded = [list(values[:len(columns)]) + [None] * (len(columns) - len(values)) for values in records]
+    return pd.DataFrame(padded, columns=columns, index=pd.Index(lines, name="line"))
+
+def _split_cells(series):
+    # "a, b,,c" -> one stripped entry per item, the index repeating the sheet line
+    parts = series.str.split(",").explode().str.strip()
+    return parts[parts.notna() & (parts != "")]
+
+def _per_line(parts, index):
+    grouped = parts.groupby(level=0).agg(list)
+    return grouped.reindex(index).apply(lambda items: items if isinstance(items, list) else [])
+
+def _compile_error(line, column, value, error):
+    return {"line": int(line) if line is not None else None, "column": column, "value": value, "error": error}
+
+def compile_apps(rows):
+    # Parses and validates the whole sheet before any request is sent.
+    # Returns (jobs, errors): one job per app to POST, one error per invalid cell.
+    import pandas as pd
+    frame = sheet_frame(rows)
+    if frame.empty:
+        return [], []
+
+    for column in APP_OPTIONAL_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = None
+    text = frame[list(APP_REQUIRED_COLUMNS + APP_OPTIONAL_COLUMNS)].fillna("").astype(str)
+    text = text.apply(lambda column: column.str.strip())
+    errors = []
+
+    def reject(values, column, error):
+        errors.extend(_compile_error(line, column, value, error) for line, value in values.items())
+
+    for column in APP_REQUIRED_COLUMNS:
+        reject(text.loc[text[column] == "", column], column, "required value is empty")
+
+    def entries(column, what):
+        # Split entries of a column; a filled cell holding only separators is rejected
+        values = _split_cells(text[column])
+        count = values.groupby(level=0).size().reindex(frame.index, fill_value=0)
+        reject(text.loc[(count == 0) & (text[column] != ""), column], column, f"no {what} in the cell")
+        return values, count
+
+    hosts, host_count = entries("Host", "host")
+
+    ports, _ = entries("Port", "port")
+    parsed = ports.str.extract(r"^(?P<type>[A-Za-z]+)\s*:\s*(?P<port>\d{1,5}(?:-\d{1,5})?)$")
+    parsed["type"] = parsed["type"].str.lower()
+    bad_port = parsed["port"].isna() | ~parsed["type"].isin(["tcp", "udp"])
+    reject(ports[bad_port], "Port", "expected protocol:port, e.g. tcp:443 or udp:5000-5010")
+    # Checked per entry: the index repeats the line, so only the offending entry is reported
+    out_of_range = ~bad_port & parsed["port"].fillna("").map(
+        lambda value: any(not 1 <= int(number) <= 65535 for number in value.split("-") if number)).astype(bool)
+    reject(ports[out_of_range], "Port", "port must be between 1 and 65535")
+    parsed = parsed[~bad_port]
+    protocols = pd.Series(
+        [{"port": port, "type": proto_type} for proto_type, port in zip(parsed["type"], parsed["port"])],
+        index=parsed.index, dtype=object)
+
+    access = entries("Access Type", "access type")[0].str.capitalize()
+    reject(access[~access.isin(ACCESS_TYPES)], "Access Type", "expected Client and/or Browser")
+    browser_lines = access[access == "Browser"].index.unique()
+    anyapp = text["AnyApp Protocol"].str.lower()
+    needs_protocol = text.index.isin(browser_lines) & ~anyapp.isin(["http", "https"])
+    reject(text.loc[needs_protocol, "AnyApp Protocol"], "AnyApp Protocol", "Browser access requires http or https")
+
+    tag_names, _ = entries("Tag", "tag")
+    publisher_names, _ = entries("Publisher", "publisher")
+    catalogue = get_publisher_catalogue() if not publisher_names.empty else None
+    if not publisher_names.empty and not catalogue:
+        reject(publisher_names, "Publisher", "publisher list could not be fetched")
+        resolved = pd.Series(dtype=object)
+    else:
+        lookup = {name: find_publisher(name) for name in publisher_names.unique()}
+        resolved = publisher_names.map(lookup)
+        reject(publisher_names[resolved.isna()], "Publisher", "publisher not found")
+        resolved = resolved.dropna()
+
+    single = text["Suffix"] + "_" + text["Name"]
+    combined = text["Suffix"] + "_Combined_" + host_count.astype(str)
+    app_names = single.where(host_count == 1, combined)
+    invalid_lines = {e["line"] for e in errors}
+    candidates = app_names[~app_names.index.isin(invalid_lines)]
+    reject(candidates[candidates.duplicated(keep=False)], "Name", "app name is duplicated in the sheet")
+
+    use_publisher_dns = text["Use Publisher DNS"].str.lower().isin(["true", "1", "yes", "y"])
+    tags = _per_line(tag_names.map(lambda tag: {"tag_name": tag}), frame.index)
+    hosts = _per_line(hosts, frame.index)
+    protocols = _per_line(protocols, frame.index)
+    access = _per_line(access, frame.index)
+    publishers = _per_line(resolved, frame.index)
+
+    invalid_lines = {e["line"] for e in errors}
+    jobs = []
+    for line in frame.index:
+        if line in invalid_lines:
+            continue
+        common = {
+            "host": hosts[line],
+            "protocols": protocols[line],
+            "publishers": publishers[line],
+            "tags": tags[line],
+            "use_publisher_dns": bool(use_publisher_dns[line]),
+        }
+        if "Client" in access[line]:
+            jobs.append({
+                "line": int(line),
+                "suffix": text["Suffix"][line],
+                "access_type": access[line],
+                "data": {"app_name": app_names[line], "clientless_access": "false", **common},
+            })
+        if "Browser" in access[line]:
+            jobs.append({
+                "line": int(line),
+                "suffix": text["Suffix"][line],
+                "access_type": access[line],
+                "data": {"app_name": app_names[line] + "_Browser", "clientless_access": "true",
+                         "private_app_protocol": anyapp[line], **common},
+            })
+
+    errors.sort(key=lambda e: (e["line"] or 0, e["column"]))
+    return jobs, errors
+
+def format_compile_error(error):
+    return f"Line {error['line']} | {error['column']}: {error['error']} ({error['value']!r})"
+
+def _send_app(job):
 
     url = f"{tenant_url}/api/v2/steering/apps/private?silent=0"
+    data = job["data"]
+    app_name = data["app_name"]
+
+    print(f"\nHost = {data['host']}")
+    print(f"Port = {data['protocols']}")
+
+    r = safe_request("POST", url, json=data)
+    status = None
+    if r is not None:
+        try:
+            status = r.json().get('status')
+        except ValueError:
+            status = None
+
+    record = {
+        "line": job["line"],
+        "app_name": app_name,
+        "host": data["host"],
+        "protocols": data["protocols"],
+        "access_type": job["access_type"],
+        "status_code": r.status_code if r is not None else 0,
+        "response": status,
+        "error": None,
+    }
+    if status == "success":
+        print("Response Body:","\033[32m", status,"\033[0m")
+        print("Private App: "+app_name+"\n")
+        return record, r, data
 
-    logs = []
+    body = r.text if r is not None else "no response"
+    print("Response Body:","\033[33m", body,"\033[0m")
+    record["error"] = body
+    return record, r, data
 
-    if not (file_path and sheet_name):
+@metered("create_apps")
+@invalidates("private_apps")
+def create_apps(file_path: str, sheet_name: str = None, skip_invalid: bool = False, resume: bool = None):
+
+    if not file_path:
         print("\n[INFO] Necessary parameters not found!")
         return
 
     print("\n\n### Automation started ###")
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
-
-    for index, row in df.iterrows():
-
-        host = row['Host'].split(',')
-
-        tags = []
-        tags_unf = row['Tag'].split(',')
-        for tag in tags_unf:
-            tags.append({"tag_name": tag})
-
-        publishers = []
-        publishers_temp = row['Publisher'].split(',')
-        publisher_check_response = publisher_validation()
-
-        for publisher in publishers_temp:
-            for index in publisher_check_response:
-                if publisher in index['publisher_name']:
-                    publishers.append(index)
-
-        protocols = []
-        protocol_entries = row['Port'].split(',')
-        for entry in protocol_entries:
-            proto_type, port = entry.split(':')
-            protocols.append({"port": port, "type": proto_type})
-        
-        app_name = row['Name']
-        suffix = row['Suffix']
-        access_type = row['Access Type'].split(',')
-        anyapp_protocol = row['AnyApp Protocol']
-        use_publisher_dns = row['Use Publisher DNS']
-
-        if len(host) == 1:
-            app_name = suffix+'_'+app_name
+    rows = open_rows(file_path, sheet_name, required=APP_REQUIRED_COLUMNS)
+    if rows is None:
+        return
+
+    jobs, errors = compile_apps(rows)
+    if errors:
+        print(f"\n[WARN] {len(errors)} problems found in the sheet:")
+        for error in errors:
+            print("[INVALID] " + format_compile_error(error))
+        if not skip_invalid:
+            print("\n[ERROR] Nothing was sent. Fix the sheet and run again.")
+            with RunLog("papps_creation_errors") as run_log:
+                for error in errors:
+                    run_log.write(error)
+            return {"sent": 0, "succeeded": 0, "skipped": 0, "invalid": len(errors), "failed": len(errors)}
+
+    print(f"\n[INFO] {len(jobs)} Private Apps compiled, sending...")
+    with RunLog("papps_creation") as run_log:
+        summary = run_journaled("create_apps", _send_app, ((payload_hash(job["data"]), job) for job in jobs),
+                                run_identity(file_path, sheet_name), resume, run_log)
+    print(f"\nPrivate Apps created: {summary['succeeded']}/{summary['sent']}")
+    return dict(summary, invalid=len(errors), failed=summary["sent"] - summary["succeeded"] + len(errors))
+
+# ----- PRIVATE APPS RECONCILIATION -----
+
+def app_fingerprint(app):
+    # Same hash for a sheet payload and for the tenant's copy of the app when
+    # host, protocols, publishers and tags match
+    hosts = app.get("host") or []
+    if isinstance(hosts, str):
+        hosts = hosts.split(",")
+    protocols = [
+        ((p.get("type") or p.get("transport") or "").lower(), str(p.get("port", "")).strip())
+        for p in app.get("protocols") or []
+    ]
+    publishers = [
+        str(p.get("publisher_id"))
+        for p in app.get("publishers") or app.get("service_publisher_assignments") or []
+    ]
+    tags = [t.get("tag_name") for t in app.get("tags") or []]
+    state = {
+        "host": sorted({h.strip().lower() for h in hosts if h.strip()}),
+        "protocols": sorted(set(protocols)),
+        "publishers": sorted(set(publishers)),
+        "tags": sorted(set(tags)),
+    }
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+def plan_apps(jobs, prune=False):
+    # Compares compiled sheet jobs with the tenant's private apps fetched once.
+    # With prune, apps sharing a sheet suffix but absent from the sheet are deleted.
+    current = {}
+    for app in inventory("private_apps", max_age=0):
+        current[app.get("app_name")] = app
+
+    plan = {"create": [], "update": [], "delete": [], "unchanged": 0}
+    wanted = set()
+    for job in jobs:
+        name = job["data"]["app_name"]
+        wanted.add(name)
+        existing = current.get(name)
+        if existing is None:
+            plan["create"].append(job)
+        elif app_fingerprint(existing) != app_fingerprint(job["data"]):
+            plan["update"].append(dict(job, app_id=str(existing.get("app_id"))))
         else:
-            app_name = suffix+'_Combined_'+len(host)
+            plan["unchanged"] += 1
+
+    if prune:
+        prefixes = tuple({job["suffix"] + "_" for job in jobs})
+        for name, app in current.items():
+            if name and prefixes and name.startswith(prefixes) and name not in wanted:
+                plan["delete"].append({"app_id": str(app.get("app_id")), "app_name": name})
+    return plan
+
+def print_app_plan(plan):
+    for job in plan["create"]:
+        print(f"[+] create {job['data']['app_name']}")
+    for job in plan["update"]:
+        print(f"[~] update {job['data']['app_name']} (ID {job['app_id']})")
+    for app in plan["delete"]:
+        print(f"[-] delete {app['app_name']} (ID {app['app_id']})")
+    print(f"\nPlan: {len(plan['create'])} to create, {len(plan['update'])} to update, "
+          f"{len(plan['delete'])} to delete, {plan['unchanged']} unchanged.")
+
+def _update_app(job):
+
+    url = f"{tenant_url}/api/v2/steering/apps/private/{job['app_id']}"
+    app_name = job["data"]["app_name"]
+
+    r = safe_request("PUT", url, json=job["data"])
+    status = None
+    if r is not None:
+        try:
+            status = r.json().get('status')
+        except ValueError:
+            status = None
+
+    record = {"action": "update", "app_name": app_name, "app_id": job["app_id"],
+              "status_code": r.status_code if r is not None else 0, "response": status, "error": None}
+    if status == "success":
+        print(f"[OK] Updated {app_name}")
+        return record
+
+    record["error"] = r.text if r is not None else "no response"
+    print(f"[FAIL] Update {app_name}:", record["error"])
+    return record
+
+RECONCILE_LOG_FIELDS = ("action", "line", "app_name", "app_id", "host", "protocols", "access_type",
+                        "status_code", "response", "error")
+
+@invalidates("private_apps")
+def apply_app_plan(plan):
+    # Returns the number of creates, updates and deletes that failed
+    failed = 0
+    with RunLog("papps_reconcile", fields=RECONCILE_LOG_FIELDS) as run_log:
+        for record, _, _ in run_concurrent(_send_app, plan["create"]):
+            failed += record["response"] != "success"
+            run_log.write(dict(record, action="create"))
+        for record in run_concurrent(_update_app, plan["update"]):
+            failed += record["response"] != "success"
+            run_log.write(record)
+
+        if plan["delete"]:
+            url = f"{tenant_url}/api/v2/steering/apps/private"
+            ids = [app["app_id"] for app in plan["delete"]]
+            summary = run_chunked("DELETE", url, ids, lambda chunk: {"private_app_ids": chunk})
+            _print_summary("Private Apps removed", summary)
+            failed += summary["ids"] - summary["ids_ok"]
+            for app in plan["delete"]:
+                run_log.write({"action": "delete", "app_name": app["app_name"], "app_id": app["app_id"]})
+    return failed
+
+@metered("reconcile_apps")
+def reconcile_apps(file_path: str, sheet_name: str = None, apply: bool = False, prune: bool = False):
+
+    if not file_path:
+        print("\n[INFO] Necessary parameters not found!")
+        return None
 
-        print(f"\nHost = {host}")
-        print(f"Port = {protocols}")
-
-        if 'Client' in access_type:
-            data = {
-                "app_name": app_name,
-                "clientless_access": "false",
-                "host": host,
-                "protocols": protocols,
-                "publishers": publishers,
-                "tags": tags,
-                "use_publisher_dns": use_publisher_dns
-            }
+    rows = open_rows(file_path, sheet_name, required=APP_REQUIRED_COLUMNS)
+    if rows is None:
+        return None
 
-            r = safe_request("POST", url, headers=api_header(), json=data)
-        
-            if r.json()['status'] == "success":
-                print("Response Body:","\033[32m", r.json()['status'],"\033[0m")
-                print("Private App: "+app_name+"\n")
-                response = "\nPrivate App: "+app_name+"\nHost: "+str(host)+"\nProtocols: "+str(protocols)+"\nAccess Type: "+str(access_type)+"\nResponse: "+r.json()['status']
-                logs.append(response)
-            else:
-                print("Response Body:","\033[33m", r.text,"\033[0m")
-                response = "\nPrivate App: "+app_name+"\nHost: "+str(host)+"\n"+"Protocols: "+str(protocols)+"\n"+"Error: "+str(r.status_code)+"\n"+"Response: "+r.json()['status']
-                logs.append(response)
-
-        if 'Browser' in access_type:
-            data = {
-                "app_name": app_name+"_Browser",
-                "host": host,
-                "clientless_access": "true",
-                "private_app_protocol": anyapp_protocol,
-                "protocols": protocols,
-                "publishers": publishers,
-                "tags": tags,
-                "use_publisher_dns": use_publisher_dns
-                }
-            
-            r = safe_request("POST", url, headers=api_header(), json=data)
-
-            if r.json()['status'] == "success":
-                print("Response Body:","\033[32m", r.json()['status'],"\033[0m")
-                print("Private App: "+app_name+"\n")
-                response = "\nPrivate App: "+app_name+"\nHost: "+str(host)+"\nProtocols: "+str(protocols)+"\nAccess Type: "+str(access_type)+"\nResponse: "+r.json()['status']
-                logs.append(response)
-            else:
-                print("Response Body:","\033[33m", r.text,"\033[0m")
-                response = "\nPrivate App: "+app_name+"\nHost: "+str(host)+"\n"+"Protocols: "+str(protocols)+"\n"+"Error: "+str(r.status_code)+"\n"+"Response: "+r.json()['status']
-                logs.append(response)
+    jobs, errors = compile_apps(rows)
+    if errors:
+        print(f"\n[WARN] {len(errors)} problems found in the sheet:")
+        for error in errors:
+            print("[INVALID] " + format_compile_error(error))
+        print("\n[ERROR] Fix the sheet before reconciling.")
+        return None
+
+    print("\n### Reading current Private Apps ###")
+    plan = plan_apps(jobs, prune=prune)
+    print_app_plan(plan)
+
+    plan["failed"] = 0
+    if apply and (plan["create"] or plan["update"] or plan["delete"]):
+        print("\n### Applying plan ###")
+        plan["failed"] = apply_app_plan(plan)
+    return plan
+
+class PolicyNameIndex:
+    # Existing NPA rule names, read once, with the highest "- N" suffix used for each base name.
+    # Names are assigned under a lock so concurrent creates never pick the same one.
+
+    def __init__(self, names=()):
+        self.taken = set()
+        self.highest: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        for name in names:
+            self._take(name)
+
+    @staticmethod
+    def split(name):
+        base, sep, suffix = name.rpartition(" - ")
+        if sep and suffix.isdigit():
+            return base, int(suffix)
+        return name, 1
+
+    def _take(self, name):
+        self.taken.add(name)
+        base, count = self.split(name)
+        if count > self.highest.get(base, 0):
+            self.highest[base] = count
+
+    def assign(self, policy_name):
+        with self.lock:
+            name = policy_name
+            if name in self.taken:
+                count = max(self.highest.get(policy_name, 1), 1) + 1
+                name = f"{policy_name} - {count}"
+                while name in self.taken:
+                    count = count+1
+                    name = f"{policy_name} - {count}"
+            self._take(name)
+            return name
+
+def iter_npa_rules(fields=None, page_size=None):
+    url = f"{tenant_url}/api/v2/policy/npa/rules"
+    limit = page_size or PAGE_SIZE
+    offset = 0
+    while True:
+        params = {"limit": limit, "offset": offset}
+        if fields:
+            params["fields"] = fields
+        r = safe_request("GET", url, params=params)
+        data = _listing_page(r, "NPA rules", f"offset {offset}").get('data', [])
+        page = data.get('rules', []) if isinstance(data, dict) else data or []
+        yield from page
+        if len(page) < limit:
+            return
+        offset += len(page)
+
+def get_policy_name_index(refresh=False):
+    with _policy_name_indexes_lock:
+        index = _policy_name_indexes.get(tenant_url)
+        if index is None or refresh:
+            index = PolicyNameIndex(rule.get("rule_name") for rule in iter_npa_rules(fields="rule_id,rule_name")
+                                    if rule.get("rule_name"))
+            _policy_name_indexes[tenant_url] = index
+        return index
+
+def _split_cell(value):
+    if _is_blank(value):
+        return []
+    return [x.strip() for x in str(value).split(',') if x.strip()]
+
+POLICY_REQUIRED_COLUMNS = ["Policy Group", "Access Method", "Action", "Private Apps"]
+POLICY_ACTIONS = ("allow", "deny")
+POLICY_LOG_FIELDS = ("line", "group_name", "policy_name", "rule_id", "created_id", "status_code", "response", "error")
+
+def policy_row_error(row):
+    # Reason a policy row cannot be sent, or None
+    if _is_blank(row['Policy Group']):
+        return "'Policy Group' is empty"
+    if not _split_cell(row['Private Apps']):
+        return "'Private Apps' is empty"
+    action = str(row['Action']).strip().lower()
+    if action not in POLICY_ACTIONS:
+        return f"'Action' must be one of {', '.join(POLICY_ACTIONS)}, got '{row['Action']}'"
+    return None
 
-    write_logs(log_filename="papps_creation.txt",logs=logs)
+def _report_policy_error(run_log, row, error):
+    print(f"[ERROR] Line {row.line}: {error}")
+    run_log.write({"line": row.line, "group_name": row.get('Policy Group'), "policy_name": None,
+                   "response": "invalid", "error": error})
 
-def create_papp_policy(file_path: str, sheet_name: str):
+def policy_payload(row):
 
-    url = f"{tenant_url}/api/v2/policy/npa/rules"
+    policy_group = str(row['Policy Group'])
+    access_method = _split_cell(row['Access Method'])
+    action = str(row['Action']).strip().lower()
+    private_apps_temp = _split_cell(row['Private Apps'])
+    private_apps_tags = _split_cell(row.get('Tags'))
+    users = _split_cell(row.get('Users'))
+    user_groups = _split_cell(row.get('Groups'))
+
+    if action == "deny":
+        policy_name = '[NPA] Bloquear '+private_apps_temp[0]
+    else:
+        policy_name = '[NPA] Liberar '+private_apps_temp[0]
+
+    private_apps = [f"[{app}]" for app in private_apps_temp]
+
+    return {
+                "description": "any",
+                "enabled": "1",
+                "group_name": policy_group,
+                "rule_data": {
+                "access_method": access_method,
+                "json_version": 3,
+                "match_criteria_action": {
+                    "action_name": action
+                },
+                "policy_type": "private-app",
+                "privateAppTags": private_apps_tags,
+                "privateApps": private_apps,
+                "userGroups": user_groups,
+                "userType": "user",
+                "users": users,
+                "version": 1
+                },
+                "rule_name": policy_name,
+                "rule_order": {
+                "order": "bottom"
+                }
+            }
 
-    logs = []
+def _create_policy_row(row):
 
-    if not (file_path and sheet_name):
+    url = f"{tenant_url}/api/v2/policy/npa/rules"
+
+    data = policy_payload(row)
+    policy_name = get_policy_name_index().assign(data["rule_name"])
+    data["rule_name"] = policy_name
+
+    r = safe_request("POST", url, json=data)
+    status, _, ok = _response_result(r)
+    record = {"line": row.line, "group_name": data["group_name"], "policy_name": policy_name,
+              "status_code": status, "response": "success" if ok else "error", "error": None}
+
+    if ok:
+        print("Response Body:","\033[32m", "success","\033[0m")
+        print("Policy Name: "+policy_name+"\n")
+        return record, r, data
+
+    body = r.text if r is not None else "no response"
+    if "may exist already" in body:
+        # Created outside this run after the index was read; the next run picks it up
+        print(f"\n[WARN] Rule name '{policy_name}' was taken since the rule names were read.")
+    print("Response Body:","\033[33m", body,"\033[0m")
+    record["error"] = body
+    return record, r, data
+
+@metered("create_papp_policy")
+@invalidates("npa_rules")
+def create_papp_policy(file_path: str, sheet_name: str = None, resume: bool = None):
+
+    if not file_path:
         print("\n[INFO] Necessary parameters not found!")
         return
 
     print("\n\n### Automation started ###")
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
-
-    for index, row in df.iterrows():
-
-        policy_group = str(row['Policy Group'])
-
-        access_method = str(row['Access Method']) if pd.notna(row['Access Method']) else []
-        if access_method != []:
-            access_method = access_method.split(',')
-
-        action = str(row['Action']).lower()
-
-        private_apps_temp = str(row['Private Apps']) if pd.notna(row['Private Apps']) else []
-        if private_apps_temp != []:
-            private_apps_temp = private_apps_temp.split(',')
-
-        private_apps_tags = str(row['Tags']) if pd.notna(row['Tags']) else []
-        if private_apps_tags != []:
-            private_apps_tags = private_apps_tags.split(',')
-
-        users = str(row['Users']) if pd.notna(row['Users']) else []
-        if users != []:
-            users = users.split(',')
-
-        user_groups = str(row['Groups']) if pd.notna(row['Groups']) else []
-        if user_groups != []:
-            user_groups = user_groups.split(',') 
-
-        private_apps = []
-
-        if action == "allow" or "Allow":
-            policy_name = '[NPA] Liberar '+private_apps_temp[0]
-        elif action == "deny" or "Deny":
-            policy_name = '[NPA] Bloquear '+private_apps_temp[0]
-
-        for app in private_apps_temp:
-            private_apps.append(f"[{app}]")
-
-
-        data = {
-                    "description": "any",
-                    "enabled": "1",
-                    "group_name": policy_group,
-                    "rule_data": {
-                    "access_method": access_method,
-                    "json_version": 3,
-                    "match_criteria_action": {
-                        "action_name": action
-                    },
-                    "policy_type": "private-app",
-                    "privateAppTags": private_apps_tags,
-                    "privateApps": private_apps,
-                    "userGroups": user_groups,
-                    "userType": "user",
-                    "users": users,
-                    "version": 1
-                    },
-                    "rule_name": policy_name,
-                    "rule_order": {
-                    "order": "bottom"
-                    }
-                }
-            
-        r = safe_request("POST", url, headers=api_header(), json=data)
-        
-        if r.json()['status'] == "success":
-            print("Response Body:","\033[32m", r.json()['status'],"\033[0m")
-            print("Policy Name: "+policy_name+"\n")
-            response = "\nPolicy Name: "+policy_name+"\nResponse: "+r.json()['status']
-            logs.append(response)
-
-        elif "may exist already" in r.text:
-            count = 2
-            while "may exist already" in r.text:
-                new_policy_name = f"{policy_name} - {count}"
-                data = {
-                    "description": "any",
-                    "enabled": "1",
-                    "group_name": policy_group,
-                    "rule_data": {
-                    "access_method": access_method,
-                    "json_version": 3,
-                    "match_criteria_action": {
-                        "action_name": action
-                    },
-                    "policy_type": "private-app",
-                    "privateAppTags": private_apps_tags,
-                    "privateApps": private_apps,
-                    "userGroups": user_groups,
-                    "userType": "user",
-                    "users": users,
-                    "version": 1
-                    },
-                    "rule_name": new_policy_name,
-                    "rule_order": {
-                    "order": "bottom"
-                    }
-                }
-                r = safe_request("POST", url, headers=api_header(), json=data)
-                count = count+1
-            if r.json()['status'] == "success":
-                print("Response Body:","\033[32m", r.json()['status'],"\033[0m")
-                print("Policy Name: "+new_policy_name+"\n")
-                response = "\nPolicy Name: "+new_policy_name+"\nResponse: "+r.json()['status']
-                logs.append(response)
-            else:
-                print("Response Body:","\033[33m", r.text,"\033[0m")
-                response = "\nPolicy Name: "+new_policy_name+"\nError: "+str(r.status_code)+"\nResponse: "+r.json()['status']
-                logs.append(response)
-    
-        else:
-            print("Response Body:","\033[33m", r.text,"\033[0m")
-            response = "\nPolicy Name: "+policy_name+"\nError: "+str(r.status_code)+"\nResponse: "+r.json()['status']
-            logs.append(response)
-
-    write_logs(log_filename="create_policies.txt",logs=logs)
+    rows = open_rows(file_path, sheet_name, required=POLICY_REQUIRED_COLUMNS)
+    if rows is None:
+        return
 
-def write_logs(log_filename: str, logs):
-    outputPath = "c:\\Netskope_API_Tool"
-    if log_filename and logs:
-        if not os.path.exists(outputPath):
-            os.mkdir(outputPath)
+    index = get_policy_name_index(refresh=True)
+    print(f"\n[INFO] {len(index.taken)} existing NPA rule names indexed.")
+
+    invalid = 0
+    with RunLog("create_policies", fields=POLICY_LOG_FIELDS) as run_log:
+
+        def valid_rows():
+            nonlocal invalid
+            for row in rows:
+                error = policy_row_error(row)
+                if error:
+                    invalid += 1
+                    _report_policy_error(run_log, row, error)
+                    continue
+                yield payload_hash(row.to_dict()), row
+
+        summary = run_journaled("create_papp_policy", _create_policy_row, valid_rows(),
+                                run_identity(file_path, sheet_name), resume, run_log)
+    summary["invalid"] = invalid
+    summary["failed"] = summary["sent"] - summary["succeeded"] + invalid
+    print(f"\nPolicies created: {summary['succeeded']}/{summary['sent']}"
+          + (f" ({invalid} invalid rows skipped)" if invalid else ""))
+    return summary
+
+def _deploy_policy_group(journal, run_log, group_name, rules):
+    # Rules of one group go out in sheet order, each placed right after the previous one,
+    # so the final order never depends on when the server processed each insert
+    url = f"{tenant_url}/api/v2/policy/npa/rules"
+    previous = None
+    results = []
+    for rule in rules:
+        if rule["done"]:
+            previous = rule["done_id"] or previous
+            results.append(dict(rule, ok=True, rule_id=rule["done_id"], skipped=True))
+            run_log.write({"line": rule["line"], "group_name": group_name, "policy_name": rule["data"]["rule_name"],
+                           "rule_id": rule["done_id"], "response": "skipped"})
+            continue
+        data = rule["data"]
+        data["rule_order"] = {"order": "after", "rule_id": previous} if previous else {"order": "bottom"}
+        r = safe_request("POST", url, json=data)
+        status, created_id, ok = _response_result(r)
+        journal.record(rule["key"], rule["input_hash"], data, status, created_id, ok)
+        run_log.write({"line": rule["line"], "group_name": group_name, "policy_name": data["rule_name"],
+                       "rule_id": created_id, "status_code": status, "response": "success" if ok else "error",
+                       "error": None if ok else (r.text if r is not None else "no response")})
+        if ok:
+            print(f"[OK] {group_name} | {data['rule_name']}")
+            if created_id:
+                previous = str(created_id)
+        else:
+            print(f"[FAIL] {group_name} | {data['rule_name']}:", r.text if r is not None else "no response")
+        results.append(dict(rule, ok=ok, rule_id=str(created_id) if created_id else None, skipped=False, status=status))
+    return group_name, results
+
+def verify_policy_order(expected):
+    # One read-back of the rule list; every group's rules must appear in the order they were sent
+    positions = {}
+    for position, rule in enumerate(iter_npa_rules(fields="rule_id,rule_name,group_name")):
+        positions[str(rule.get("rule_id"))] = position
+    problems = {}
+    for group_name, rule_ids in expected.items():
+        found = [positions.get(rule_id) for rule_id in rule_ids]
+        missing = [rule_id for rule_id, position in zip(rule_ids, found) if position is None]
+        present = [position for position in found if position is not None]
+        if missing or present != sorted(present):
+            problems[group_name] = {"missing": missing, "ordered": present == sorted(present)}
+    return problems
+
+@metered("deploy_policies")
+@invalidates("npa_rules")
+def deploy_policies(file_path: str, sheet_name: str = None, resume: bool = None):
+
+    if not file_path:
+        print("\n[INFO] Necessary parameters not found!")
+        return None
 
-        dateNow = datetime.now().strftime("%d-%m-%Y_%Hh%Mm")
-        pathDate = f"{outputPath}\\{dateNow}"
+    rows = open_rows(file_path, sheet_name, required=POLICY_REQUIRED_COLUMNS)
+    if rows is None:
+        return None
 
-        os.mkdir(pathDate)
+    print("\n\n### Policy deployment started ###")
+    journal = JobJournal(JOURNAL_PATH, tenant_url, "deploy_policies", run_identity(file_path, sheet_name))
+    done = journal.created_ids() if _start_journal(journal, resume) else {}
+    index = get_policy_name_index(refresh=True)
+
+    # Names are assigned in sheet order before anything is sent, so they are deterministic too
+    run_log = RunLog("deploy_policies", fields=POLICY_LOG_FIELDS)
+    groups: Dict[str, list] = {}
+    occurrences = {}
+    invalid = 0
+    for row in rows:
+        error = policy_row_error(row)
+        if error:
+            invalid += 1
+            _report_policy_error(run_log, row, error)
+            continue
+        input_hash = payload_hash(row.to_dict())
+        occurrences[input_hash] = occurrences.get(input_hash, 0) + 1
+        key = f"{input_hash}#{occurrences[input_hash]}"
+        data = policy_payload(row)
+        if key not in done:
+            data["rule_name"] = index.assign(data["rule_name"])
+        groups.setdefault(data["group_name"], []).append({
+            "line": row.line, "key": key, "input_hash": input_hash, "data": data,
+            "done": key in done, "done_id": done.get(key),
+        })
+
+    total = sum(len(rules) for rules in groups.values())
+    print(f"\n[INFO] {total} rules in {len(groups)} policy groups, sending groups in parallel.")
+    if invalid:
+        print(f"[WARN] {invalid} invalid rows skipped.")
+    try:
+        results = dict(run_concurrent(lambda item: _deploy_policy_group(journal, run_log, *item),
+                                      list(groups.items()), BULK_CONCURRENCY))
+        if all(rule["ok"] for rules in results.values() for rule in rules):
+            journal.finish()
+    finally:
+        journal.close()
+        run_log.close()
+
+    expected = {name: [r["rule_id"] for r in rules if r["ok"] and r["rule_id"]] for name, rules in results.items()}
+    print("\n### Verifying rule order ###")
+    problems = verify_policy_order(expected)
+    for group_name, problem in problems.items():
+        if problem["missing"]:
+            print(f"[WARN] {group_name}: {len(problem['missing'])} rules not found in the read-back.")
+        if not problem["ordered"]:
+            print(f"[WARN] {group_name}: rules are not in sheet order.")
+
+    succeeded = sum(1 for rules in results.values() for rule in rules if rule["ok"])
+    print(f"\nPolicy deployment finished: {succeeded}/{total} rules in place, "
+          f"{len(groups) - len(problems)}/{len(groups)} groups verified in order.")
+    # A group whose read-back is incomplete or out of order counts as a failure too
+    return {"rules": total, "succeeded": succeeded, "invalid": invalid, "misordered": len(problems),
+            "failed": total - succeeded + invalid + len(problems), "groups": results}
+
+
+# ----- ASYNC CLIENT -----
+
+class NetskopeAsyncClient:
+    # Coroutine versions of the tool's operations sharing one connection pool and the rate-limit buckets
+
+    def __init__(self, tenant_name, key, pool_size=None, timeout=15, base_url=None):
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError("NetskopeAsyncClient requires httpx (pip install httpx)")
+        self._httpx = httpx
+        self.tenant_url = base_url or f"https://{tenant_name}.goskope.com"
+        pool_size = pool_size or POOL_SIZE
+        self._client = httpx.AsyncClient(
+            base_url=self.tenant_url,
+            headers={
+                "accept": "application/json",
+                "Authorization": "Bearer " + key,
+                "Content-Type": "application/json"
+            },
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def throttle_state(self):
+        return {family: bucket.state() for family, bucket in self._buckets.items()}
+
+    async def request(self, method, path, json=None, params=None):
+        import asyncio
+        family = endpoint_family(path)
+        bucket = self._buckets.get(family)
+        if bucket is None:
+            bucket = self._buckets[family] = TokenBucket(RATE_LIMITS.get(family, RATE_LIMITS["other"]))
+        attempt = 0
+        while True:
+            wait = bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            started = time.monotonic()
+            try:
+                r = await self._client.request(method, path, json=json, params=params)
+            except self._httpx.TimeoutException:
+                record_request(method, path, 0, time.monotonic() - started)
+                print("\n[ERROR] Request timed out.")
+                return None
+            except self._httpx.HTTPError as e:
+                record_request(method, path, 0, time.monotonic() - started)
+                print(f"\n[ERROR] Request failed: {e}")
+                return None
+
+            bucket.observe(r.status_code, r.headers)
+            delay = retry_delay(r.status_code, r.headers, attempt, method)
+            record_request(method, path, r.status_code, time.monotonic() - started,
+                           _body_size(r.request.content), len(r.content), retried=delay is not None)
+            if delay is None:
+                return r
+            if r.status_code == 429:
+                bucket.pause(delay)
+            with bucket.lock:
+                bucket.retries += 1
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _succeeded(r):
+        if r is None:
+            return False
+        try:
+            return r.json().get("status") == "success"
+        except ValueError:
+            return False
+
+    # SCIM
+
+    async def _find_scim(self, resource, attribute, value):
+        r = await self.request("GET", f"/api/v2/scim/{resource}", params={"filter": f"{attribute} eq {value}"})
+        if r is None or r.status_code != 200:
+            return None
+        resources = r.json().get("Resources") or []
+        return resources[0]["id"] if resources else None
+
+    async def find_user(self, user):
+        return await self._find_scim("Users", "userName", user)
+
+    async def find_group(self, group_name):
+        return await self._find_scim("Groups", "displayName", group_name)
+
+    async def create_group(self, group_name):
+        r = await self.request("POST", "/api/v2/scim/Groups", json=scim_group_payload(group_name))
+        return r.json() if r is not None and r.status_code == 201 else None
+
+    async def patch_group_member(self, group_id, user_ids, op):
+        if isinstance(user_ids, str):
+            user_ids = [user_ids]
+        r = await self.request("PATCH", f"/api/v2/scim/Groups/{group_id}", json=scim_member_patch_payload(user_ids, op))
+        return r is not None and r.status_code in (200, 204)
+
+    async def create_scim_user(self, first_name, last_name, username):
+        r = await self.request("POST", "/api/v2/scim/Users", json=scim_user_payload(first_name, last_name, username))
+        return r.json() if r is not None and r.status_code == 201 else None
+
+    async def delete_scim_user(self, user_id):
+        r = await self.request("DELETE", f"/api/v2/scim/Users/{user_id}")
+        return r is not None and r.status_code == 204
+
+    # Private apps
+
+    async def iter_private_apps(self, query=None, fields=None, page_size=None):
+        limit = page_size or PAGE_SIZE
+        offset = 0
+        while True:
+            params = {"limit": limit, "offset": offset}
+            if query:
+                params["query"] = query
+            if fields:
+                params["fields"] = fields
+            r = await self.request("GET", "/api/v2/steering/apps/private", params=params)
+            page = _listing_page(r, "Private Apps", f"offset {offset}").get("data", {}).get("private_apps", []) or []
+            for app in page:
+                yield app
+            if len(page) < limit:
+                return
+            offset += len(page)
+
+    async def create_private_app(self, data):
+        r = await self.request("POST", "/api/v2/steering/apps/private", json=data, params={"silent": "0"})
+        return r.json() if self._succeeded(r) else None
+
+    async def update_private_app(self, app_id, data):
+        r = await self.request("PUT", f"/api/v2/steering/apps/private/{app_id}", json=data)
+        return self._succeeded(r)
+
+    async def delete_private_apps(self, app_ids):
+        r = await self.request("DELETE", "/api/v2/steering/apps/private", json={"private_app_ids": [str(x) for x in app_ids]})
+        return self._succeeded(r)
+
+    # Tags
+
+    async def list_tags(self):
+        r = await self.request("GET", "/api/v2/steering/apps/private/tags")
+        if r is None or r.status_code != 200:
+            return []
+        return [tag["tag_name"] for tag in r.json().get("data", {}).get("tags", [])]
+
+    async def apply_tags(self, app_ids, tags):
+        r = await self.request("PATCH", "/api/v2/steering/apps/private/tags", json={"ids": [str(x) for x in app_ids], "tags": tags})
+        return self._succeeded(r)
+
+    async def delete_tags(self, app_ids, tags):
+        r = await self.request("DELETE", "/api/v2/steering/apps/private/tags", json={"ids": [str(x) for x in app_ids], "tags": tags})
+        return self._succeeded(r)
+
+    # Publishers
+
+    async def list_publishers(self):
+        r = await self.request("GET", "/api/v2/infrastructure/publishers", params={"fields": "publisher_id,publisher_name"})
+        if not self._succeeded(r):
+            return []
+        return r.json()["data"]["publishers"]
+
+    async def update_publishers(self, action, app_ids, publisher_ids):
+        method = {"replace": "PUT", "add": "PATCH", "delete": "DELETE"}[action]
+        data = {"private_app_ids": [str(x) for x in app_ids], "publisher_ids": [str(x) for x in publisher_ids]}
+        r = await self.request(method, "/api/v2/steering/apps/private/publishers", json=data)
+        return self._succeeded(r)
+
+    # NPA rules
+
+    async def create_npa_rule(self, data):
+        r = await self.request("POST", "/api/v2/policy/npa/rules", json=data)
+        return r.json() if self._succeeded(r) else None
+
+# ----- RUN LOGS -----
+
+class RunLog:
+    # Result records of one run, streamed as JSONL or CSV through a buffered writer.
+    # Every run gets its own directory, so runs started in the same second never collide.
+    # CSV columns are the declared fields plus any key seen later; a record bringing a new
+    # key starts a new part whose header has it, so no value is ever dropped.
+
+    def __init__(self, name, directory=None, fmt=None, compress=None, rotate_bytes=None,
+                 flush_every=None, flush_interval=None, fields=None):
+        self.name = name
+        self.directory = directory or LOG_DIR
+        self.fmt = (fmt or LOG_FORMAT).lower()
+        self.compress = LOG_GZIP if compress is None else compress
+        self.rotate_bytes = int(LOG_ROTATE_MB * 1024 * 1024) if rotate_bytes is None else rotate_bytes
+        self.flush_every = flush_every or LOG_FLUSH_EVERY
+        self.flush_interval = LOG_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.run_dir = None
+        self.paths = []
+        self.records = 0
+        self.fields = list(fields) + ["timestamp"] if fields else None
+        self.pending = []
+        self.file = None
+        self.part = 0
+        self.written = 0
+        self.flushed = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _open(self):
+        if self.run_dir is None:
+            os.makedirs(self.directory, exist_ok=True)
+            prefix = datetime.now().strftime("%Y-%m-%d_%Hh%Mm%Ss_")
+            self.run_dir = tempfile.mkdtemp(prefix=prefix, dir=self.directory)
+        part = f".{self.part}" if self.part else ""
+        path = os.path.join(self.run_dir, f"{self.name}{part}.{self.fmt}" + (".gz" if self.compress else ""))
+        if self.compress:
+            self.file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        else:
+            self.file = open(path, "w", encoding="utf-8", newline="", buffering=1024 * 1024)
+        self.paths.append(path)
+        self.written = 0
+        if self.fmt == "csv":
+            self.pending.insert(0, self._csv_line(self.fields))
+
+    def _csv_line(self, values):
+        out = io.StringIO()
+        csv.writer(out).writerow(
+            json.dumps(v, default=str) if isinstance(v, (list, dict)) else ("" if v is None else v) for v in values)
+        return out.getvalue()
+
+    def _serialize(self, record):
+        if self.fmt == "csv":
+            if self.fields is None:
+                self.fields = list(record)
+            new = [key for key in record if key not in self.fields]
+            if new:
+                self._next_part()
+                self.fields.extend(new)
+            return self._csv_line(record.get(field) for field in self.fields)
+        return json.dumps(record, default=str) + "\n"
+
+    def _next_part(self):
+        # Lines already serialized keep the current header; later ones go to a new part
+        self._flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.part += 1
+
+    def write(self, record):
+        record = dict(record, timestamp=datetime.now().isoformat(timespec="seconds"))
+        with self.lock:
+            line = self._serialize(record)
+            self.pending.append(line)
+            self.records += 1
+            if len(self.pending) >= self.flush_every or time.monotonic() - self.flushed >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        if self.pending:
+            if self.file is None:
+                self._open()
+            data = "".join(self.pending)
+            self.pending = []
+            self.file.write(data)
+            self.file.flush()
+            self.written += len(data)
+            if self.rotate_bytes and self.written >= self.rotate_bytes:
+                self.file.close()
+                self.file = None
+                self.part += 1
+        self.flushed = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        if self.paths:
+            print(f"\n[INFO] {self.records} records written to {self.run_dir}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ----- COMMAND LINE -----
+
+OPERATIONS = {
+    "apps create": lambda o: create_apps(o["file"], o.get("sheet"), skip_invalid=o.get("skip_invalid", False),
+                                         resume=o.get("resume")),
+    "apps reconcile": lambda o: reconcile_apps(o["file"], o.get("sheet"), apply=o.get("apply", False),
+                                               prune=o.get("prune", False)),
+    "tags apply": lambda o: (papps_tags_from_excel_bulk if o.get("bulk") else papps_tags_from_excel)(
+        o["file"], o.get("sheet")),
+    "policies create": lambda o: (deploy_policies if o.get("ordered") else create_papp_policy)(
+        o["file"], o.get("sheet"), resume=o.get("resume")),
+    "groups members": lambda o: bulk_group_members(o["file"], o.get("sheet")),
+    "users provision": lambda o: bulk_provision_users(o["file"], o.get("sheet")),
+    "inventory export": lambda o: export_inventory(o.get("dir"), o.get("format") or "jsonl", o.get("collections"),
+                                                   snapshot=not o.get("no_snapshot", False),
+                                                   full=o.get("full", False)),
+}
+
+# Operations that do not read an input file
+FILELESS_OPERATIONS = {"inventory export"}
+
+def run_operation(op, options):
+    # Returns True when the operation ran to completion
+    name = " ".join(str(op).replace(".", " ").split())
+    operation = OPERATIONS.get(name)
+    if operation is None:
+        print(f"\n[ERROR] Unknown operation '{op}'. Available: {', '.join(sorted(OPERATIONS))}")
+        return False
+    if name not in FILELESS_OPERATIONS and not options.get("file"):
+        print(f"\n[ERROR] Operation '{name}' needs a file.")
+        return False
+    started = time.monotonic()
+    try:
+        result = operation(options)
+    except Exception as e:
+        print(f"\n[ERROR] Operation '{name}' failed: {e}")
+        return False
+    elapsed = time.monotonic() - started
+    # Operations return None when they stop before doing their work, and a summary with
+    # a "failed" count otherwise; any failed item makes the run fail
+    if result is None:
+        print(f"\n[ERROR] '{name}' stopped after {elapsed:.1f}s without completing.")
+        return False
+    failed = result.get("failed", 0) if isinstance(result, dict) else 0
+    if failed:
+        print(f"\n[ERROR] '{name}' finished in {elapsed:.1f}s with {failed} failures.")
+        return False
+    print(f"\n[INFO] '{name}' finished in {elapsed:.1f}s.")
+    return True
+
+def load_job_file(path):
+    with open(path, encoding="utf-8") as f:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("YAML job files require PyYAML (pip install pyyaml)")
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+def run_job_file(path):
+    # Runs every job of the file in order over this process's connection pool
+    try:
+        spec = load_job_file(path)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"\n[ERROR] Unable to read job file: {e}")
+        return False
 
-        with open(f"{pathDate}\\{log_filename}", 'w') as arquivo:
-            arquivo.write(f"\n{dateNow}\n\n")
-            arquivo.writelines('\n'.join(logs))
-    else:
-        return
+    base_dir = os.path.dirname(os.path.abspath(path))
+    ok = True
+    for number, job in enumerate(spec.get("jobs") or [], start=1):
+        options = dict(job)
+        if options.get("file") and not os.path.isabs(options["file"]):
+            options["file"] = os.path.join(base_dir, options["file"])
+        print(f"\n### Job {number}: {options.get('op')} ###")
+        if not run_operation(options.get("op"), options):
+            ok = False
+            if spec.get("stop_on_error"):
+                break
+    return ok
+
+def _add_file_arguments(parser):
+    parser.add_argument("file", help="CSV, JSONL or Excel file")
+    parser.add_argument("--sheet", help="sheet name (Excel only)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Netskope API Tool")
+    parser.add_argument("--tenant", default="",
+                        help="tenant name, as in <tenant>.goskope.com (default: $NETSKOPE_TENANT or the config file)")
+    parser.add_argument("--api-key", default="",
+                        help="REST API v2 token (default: $NETSKOPE_API_KEY, the config file or the keyring)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="number of Excel rows sent in parallel (default: %(default)s)")
+    parser.add_argument("--resume", action="store_true", default=RESUME,
+                        help="skip rows the job journal already records as completed")
+    parser.add_argument("--metrics-file", default=METRICS_FILE,
+                        help="write request metrics in OpenMetrics text format to this file on exit")
+    areas = parser.add_subparsers(dest="area", metavar="command")
+
+    actions = areas.add_parser("apps", help="private apps").add_subparsers(dest="action", required=True)
+    create = actions.add_parser("create", help="create private apps from a sheet")
+    _add_file_arguments(create)
+    create.add_argument("--skip-invalid", action="store_true", help="send the valid rows even if some are invalid")
+    reconcile = actions.add_parser("reconcile", help="plan (and apply) the changes between a sheet and the tenant")
+    _add_file_arguments(reconcile)
+    reconcile.add_argument("--apply", action="store_true", help="send the planned changes")
+    reconcile.add_argument("--prune", action="store_true", help="delete apps with the sheet's suffixes missing from it")
+
+    actions = areas.add_parser("tags", help="private app tags").add_subparsers(dest="action", required=True)
+    apply_tags = actions.add_parser("apply", help="apply tags per host from a sheet")
+    _add_file_arguments(apply_tags)
+    apply_tags.add_argument("--bulk", action="store_true", help="resolve hosts from one inventory download")
+
+    actions = areas.add_parser("policies", help="NPA policies").add_subparsers(dest="action", required=True)
+    policies = actions.add_parser("create", help="create NPA rules from a sheet")
+    _add_file_arguments(policies)
+    policies.add_argument("--ordered", action="store_true", help="deploy per policy group in sheet order")
+
+    actions = areas.add_parser("groups", help="SCIM groups").add_subparsers(dest="action", required=True)
+    _add_file_arguments(actions.add_parser("members", help="add/remove group members from a file"))
+
+    actions = areas.add_parser("users", help="SCIM users").add_subparsers(dest="action", required=True)
+    _add_file_arguments(actions.add_parser("provision", help="create/delete users from a file"))
+
+    actions = areas.add_parser("inventory", help="tenant inventory").add_subparsers(dest="action", required=True)
+    export = actions.add_parser("export", help="export apps, publishers, NPA rules, users and groups")
+    export.add_argument("--dir", help="output directory (default: <log dir>/exports)")
+    export.add_argument("--format", choices=("jsonl", "csv", "parquet"), default="jsonl")
+    export.add_argument("--collections", nargs="+", choices=sorted(INVENTORY_COLLECTIONS),
+                        help="collections to export (default: all)")
+    export.add_argument("--no-snapshot", action="store_true", help="do not update the local snapshot file")
+    export.add_argument("--full", action="store_true",
+                        help="refetch every page instead of only the records whose modification time changed")
+
+    run = areas.add_parser("run", help="run a JSON/YAML job file")
+    run.add_argument("job_file")
+    return parser
+
+def main(argv=None):
+    global CONCURRENCY, POOL_SIZE, RESUME
+    args = build_parser().parse_args(argv)
+    CONCURRENCY = max(1, args.concurrency)
+    RESUME = args.resume
+    if CONCURRENCY > POOL_SIZE:
+        POOL_SIZE = CONCURRENCY
+
+    tenant_name, key = load_credentials(args.tenant, args.api_key)
+    if args.area is None:
+        tenant_name = tenant_name or input("\nTenant name: ")
+        configure(tenant_name, key or load_credentials(tenant_name)[1] or input("API key: "))
+        try:
+            select_option()
+        finally:
+            if args.metrics_file:
+                write_openmetrics(args.metrics_file)
+        return 0
+
+    if not (tenant_name and key):
+        print(f"\n[ERROR] Set --tenant/--api-key, NETSKOPE_TENANT/NETSKOPE_API_KEY, {CONFIG_PATH} "
+              f"or a '{KEYRING_SERVICE}' keyring entry.")
+        return 2
+    configure(tenant_name, key)
 
+    try:
+        if args.area == "run":
+            ok = run_job_file(args.job_file)
+        else:
+            options = {name: value for name, value in vars(args).items() if name not in ("tenant", "api_key")}
+            ok = run_operation(f"{args.area} {args.action}", options)
+    finally:
+        print_connection_stats()
+        close_sessions()
+        if args.metrics_file:
+            write_openmetrics(args.metrics_file)
+    return 0 if ok else 1
 
 
 if __name__ == "__main__":
-    select_option()
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import os
+import sys
+import csv
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+import contextlib
+
+import Netskope_API_Tool_v2 as tool
+from netskope_mock_server import MockNetskope, MockServer
+
+# Runs the tool's bulk workloads against the local mock server with synthetic sheets
+# and reports throughput and memory, so changes can be compared without a real tenant.
+
+WORKLOADS = ("create_apps", "tags_per_host", "tags_bulk", "create_policies", "delete_apps")
+
+
+def write_sheet(path, header, rows):
+    if path.endswith(".xlsx"):
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Sheet1")
+        sheet.append(header)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+    return path
+
+
+def make_sheets(directory, count, publishers, extension):
+    apps = write_sheet(
+        os.path.join(directory, f"apps_{count}{extension}"),
+        ["Name", "Host", "Tag", "Publisher", "Port", "Suffix", "Access Type", "AnyApp Protocol", "Use Publisher DNS"],
+        ([f"app{i}", f"host{i}.bench.local", f"bench,t{i % 10}", f"pub-{i % publishers + 1}",
+          "tcp:443,tcp:80", "BM", "Client", "", "false"] for i in range(count)))
+    tags = write_sheet(
+        os.path.join(directory, f"tags_{count}{extension}"),
+        ["Host", "Tag"],
+        ([f"host{i}.bench.local", f"extra{i % 5}"] for i in range(count)))
+    policies = write_sheet(
+        os.path.join(directory, f"policies_{count}{extension}"),
+        ["Policy Group", "Access Method", "Action", "Private Apps", "Tags", "Users", "Groups"],
+        ([f"G{i % 10}", "Client", "Allow", f"BM_app{i}", "", f"user{i}@bench.local", ""] for i in range(count)))
+    return {"apps": apps, "tags": tags, "policies": policies}
+
+
+def run_workload(name, sheets):
+    sheet_name = "Sheet1" if sheets["apps"].endswith(".xlsx") else None
+    if name == "create_apps":
+        tool.create_apps(sheets["apps"], sheet_name)
+    elif name == "tags_per_host":
+        tool.papps_tags_from_excel(sheets["tags"], sheet_name)
+    elif name == "tags_bulk":
+        tool.papps_tags_from_excel_bulk(sheets["tags"], sheet_name)
+    elif name == "create_policies":
+        tool.create_papp_policy(sheets["policies"], sheet_name)
+    elif name == "delete_apps":
+        tool.papps_delete(tool.get_all_papps(consuming=True))
+
+
+def measure(name, sheets, count, trace_memory, verbose):
+    requests_before = tool.get_metrics().summary()["requests"]
+    if trace_memory:
+        tracemalloc.start()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    started = time.perf_counter()
+    with output:
+        run_workload(name, sheets)
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    requests = tool.get_metrics().summary()["requests"] - requests_before
+    return {
+        "workload": name,
+        "rows": count,
+        "seconds": elapsed,
+        "rows_per_s": count / elapsed if elapsed else 0.0,
+        "requests": requests,
+        "requests_per_s": requests / elapsed if elapsed else 0.0,
+        "peak_mb": peak,
+    }
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def print_results(results):
+    print(f"\n{'workload':<16} {'rows':>8} {'seconds':>9} {'rows/s':>9} {'requests':>9} {'req/s':>9} {'peak MB':>8}")
+    for r in results:
+        peak = f"{r['peak_mb']:.1f}" if r["peak_mb"] is not None else "-"
+        print(f"{r['workload']:<16} {r['rows']:>8} {r['seconds']:>9.2f} {r['rows_per_s']:>9.1f} "
+              f"{r['requests']:>9} {r['requests_per_s']:>9.1f} {peak:>8}")
+    rss = max_rss_mb()
+    if rss is not None:
+        print(f"\nProcess max RSS: {rss:.1f} MB")
+
+
+def import_time(runs=5):
+    # Fresh interpreter per run; reports the median and which heavy modules were loaded
+    probe = ("import sys, time; started = time.perf_counter(); import Netskope_API_Tool_v2; "
+             "print((time.perf_counter() - started) * 1000, *[m for m in ('pandas', 'openpyxl', 'httpx', 'asyncio') "
+             "if m in sys.modules])")
+    timings = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+        timings.append(float(output[0]))
+        loaded.update(output[1:])
+    return statistics.median(timings), sorted(loaded)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the Netskope API Tool against the local mock server")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000],
+                        help="sheet sizes to run (default: 1000 10000; add 100000 for the large run)")
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--format", choices=("xlsx", "csv"), default="xlsx", help="synthetic sheet format")
+    parser.add_argument("--concurrency", type=int, default=8, help="rows sent in parallel by the tool")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock server latency per request, in seconds")
+    parser.add_argument("--rate", type=int, default=0, help="mock rate limit per endpoint family (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock responses that are HTTP 500")
+    parser.add_argument("--trace-memory", action="store_true", help="record peak Python allocations (slower)")
+    parser.add_argument("--verbose", action="store_true", help="keep the tool's per-row output")
+    parser.add_argument("--import-time", action="store_true", help="only measure the module import time")
+    parser.add_argument("--max-import-ms", type=float, default=None,
+                        help="with --import-time, exit 1 when the median import is slower than this")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.import_time:
+        median, loaded = import_time()
+        print(f"Import time: {median:.1f} ms (median of 5)")
+        if loaded:
+            print(f"[WARN] Heavy modules loaded at import: {', '.join(loaded)}")
+        if args.max_import_ms is not None and (median > args.max_import_ms or loaded):
+            return 1
+        return 0
+
+    tool.CONCURRENCY = max(1, args.concurrency)
+    tool.POOL_SIZE = max(tool.POOL_SIZE, tool.CONCURRENCY, tool.BULK_CONCURRENCY)
+    tool.MAX_RETRIES = max(tool.MAX_RETRIES, 8)
+    # The client-side limiter would otherwise cap every run at its default requests per second
+    for family in tool.RATE_LIMITS:
+        tool.RATE_LIMITS[family] = float(args.rate or 1000000)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            for count in args.rows:
+                mock = MockNetskope(latency=args.latency, rate=args.rate, error_rate=args.error_rate, seed=count)
+                with MockServer(mock) as server:
+                    tool.configure("benchmark", "benchmark")
+                    tool.tenant_url = server.url
+                    tool.JOURNAL_PATH = os.path.join(directory, f"journal_{count}.sqlite")
+                    tool.SNAPSHOT_PATH = os.path.join(directory, f"snapshot_{count}.sqlite")
+                    tool.LOG_DIR = os.path.join(directory, "logs")
+                    sheets = make_sheets(directory, count, len(mock.publishers), "." + args.format)
+                    for name in args.workloads:
+                        result = measure(name, sheets, count, args.trace_memory, args.verbose)
+                        results.append(result)
+                        print(f"[OK] {name} x {count}: {result['seconds']:.2f}s, {result['requests']} requests")
+                    tool.close_sessions()
+        finally:
+            os.chdir(cwd)
+
+    print_results(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,527 @@
+import re
+import json
+import time
+import random
+import functools
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from typing import Dict
+
+# Local stand-in for the Netskope REST API v2 endpoints used by Netskope_API_Tool_v2.
+# State lives in memory; latency, rate limits and error injection are configurable.
+
+FAMILIES = ("scim", "steering", "policy", "infrastructure")
+
+
+class MockNetskope:
+
+    def __init__(self, latency=0.0, jitter=0.0, rate=0, error_rate=0.0, publishers=5, scim_bulk=True, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.error_rate = error_rate
+        self.scim_bulk = scim_bulk
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.windows: Dict[str, list] = {}
+        self.requests = 0
+        self.ids = 1000
+
+        # Name indexes keep lookups O(1) so 100k-row benchmarks measure the client, not the mock
+        self.users: Dict[str, dict] = {}
+        self.user_names: Dict[str, str] = {}
+        self.groups: Dict[str, dict] = {}
+        self.group_names: Dict[str, str] = {}
+        self.apps: Dict[int, dict] = {}
+        self.app_names: Dict[str, int] = {}
+        self.app_hosts: Dict[str, set] = {}
+        self.tags: Dict[str, int] = {}
+        self.rules = []
+        self.rule_names = set()
+        self.publishers = [
+            {"publisher_id": n, "publisher_name": f"pub-{n}"} for n in range(1, publishers + 1)
+        ]
+
+    def modified(self):
+        # Microsecond timestamps so back-to-back changes still differ
+        now = time.time()
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now)) + f".{int(now * 1e6) % 1000000:06d}Z"
+
+    @staticmethod
+    def project(records, query):
+        fields = [f for f in query.get("fields", [""])[0].split(",") if f]
+        if not fields:
+            return records
+        return [{f: r[f] for f in fields if f in r} for r in records]
+
+    def next_id(self):
+        self.ids += 1
+        return self.ids
+
+    # ----- transport behaviour -----
+
+    def admit(self, family):
+        # Fixed one-second window per endpoint family; returns (allowed, headers)
+        if not self.rate:
+            return True, {}
+        now = time.time()
+        second = int(now)
+        with self.lock:
+            window = self.windows.get(family)
+            if window is None or window[0] != second:
+                window = self.windows[family] = [second, 0]
+            window[1] += 1
+            used = window[1]
+        remaining = max(0, self.rate - used)
+        headers = {
+            "RateLimit-Limit": str(self.rate),
+            "RateLimit-Remaining": str(remaining),
+            "RateLimit-Reset": f"{max(0.0, second + 1 - now):.3f}",
+        }
+        if used > self.rate:
+            headers["Retry-After"] = "1"
+            return False, headers
+        return True, headers
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+    def inject_error(self):
+        return self.error_rate and self.random.random() < self.error_rate
+
+    # ----- dispatch -----
+
+    def handle(self, method, path, query, body):
+        with self.lock:
+            self.requests += 1
+        route = path[len("/api/v2"):] if path.startswith("/api/v2") else path
+        routes = (
+            (r"/scim/ServiceProviderConfig", {"GET": self.scim_config}),
+            (r"/scim/Bulk", {"POST": self.scim_bulk_request}),
+            (r"/scim/Users", {"GET": self.list_users, "POST": self.create_user}),
+            (r"/scim/Users/(?P<id>[^/]+)", {"GET": self.get_user, "DELETE": self.delete_user}),
+            (r"/scim/Groups", {"GET": self.list_groups, "POST": self.create_group}),
+            (r"/scim/Groups/(?P<id>[^/]+)", {"GET": self.get_group, "PATCH": self.patch_group}),
+            (r"/steering/apps/private", {"GET": self.list_apps, "POST": self.create_app, "DELETE": self.delete_apps}),
+            (r"/steering/apps/private/tags", {"GET": self.list_tags, "PATCH": self.apply_tags,
+                                              "DELETE": self.remove_tags}),
+            (r"/steering/apps/private/publishers", {
+                method: functools.partial(self.set_publishers, method) for method in ("PUT", "PATCH", "DELETE")
+            }),
+            (r"/steering/apps/private/(?P<id>\d+)", {"GET": self.get_app, "PUT": self.update_app}),
+            (r"/infrastructure/publishers", {"GET": self.list_publishers}),
+            (r"/policy/npa/rules", {"GET": self.list_rules, "POST": self.create_rule}),
+            (r"/policy/npa/rules/(?P<id>\d+)", {"GET": self.get_rule}),
+        )
+        for pattern, methods in routes:
+            match = re.fullmatch(pattern, route)
+            if match:
+                handler = methods.get(method)
+                if handler is None:
+                    return 405, {"status": "error", "message": "method not allowed"}
+                with self.lock:
+                    return handler(query=query, body=body, **match.groupdict())
+        return 404, {"status": "error", "message": f"unknown endpoint {route}"}
+
+    # ----- SCIM -----
+
+    @staticmethod
+    def _scim_filter(query, attribute):
+        value = query.get("filter", [""])[0]
+        match = re.fullmatch(rf'\s*{attribute} eq "?(.*?)"?\s*', value)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def _scim_list(resources, query):
+        start = int(query.get("startIndex", ["1"])[0])
+        count = int(query.get("count", ["100"])[0])
+        page = resources[start - 1:start - 1 + count]
+        return 200, {"totalResults": len(resources), "startIndex": start, "itemsPerPage": len(page),
+                     "Resources": page, "schemas": ["urn:ietf:params:scim:api:messages:2.0:ListResponse"]}
+
+    def scim_config(self, query, body):
+        return 200, {"bulk": {"supported": self.scim_bulk, "maxOperations": 100}}
+
+    def list_users(self, query, body):
+        name = self._scim_filter(query, "userName")
+        if name is not None:
+            user_id = self.user_names.get(name.casefold())
+            return self._scim_list([self.users[user_id]] if user_id else [], query)
+        return self._scim_list(list(self.users.values()), query)
+
+    def create_user(self, query, body):
+        username = (body or {}).get("userName")
+        if not username:
+            return 400, {"detail": "userName is required"}
+        if username.casefold() in self.user_names:
+            return 409, {"detail": "User already exists"}
+        user = dict(body, id=str(self.next_id()))
+        self.users[user["id"]] = user
+        self.user_names[username.casefold()] = user["id"]
+        return 201, user
+
+    def get_user(self, query, body, id):
+        user = self.users.get(id)
+        return (200, user) if user else (404, {"detail": "User not found"})
+
+    def delete_user(self, query, body, id):
+        user = self.users.pop(id, None)
+        if user is None:
+            return 404, {"detail": "User not found"}
+        self.user_names.pop(user["userName"].casefold(), None)
+        for group in self.groups.values():
+            group["members"] = [m for m in group["members"] if m["value"] != id]
+        return 204, None
+
+    def list_groups(self, query, body):
+        name = self._scim_filter(query, "displayName")
+        if name is not None:
+            group_id = self.group_names.get(name.casefold())
+            return self._scim_list([self.groups[group_id]] if group_id else [], query)
+        return self._scim_list(list(self.groups.values()), query)
+
+    def create_group(self, query, body):
+        name = (body or {}).get("displayName")
+        if not name:
+            return 400, {"detail": "displayName is required"}
+        if name.casefold() in self.group_names:
+            return 409, {"detail": "Group already exists"}
+        group = dict(body, id=str(self.next_id()), members=[])
+        self.groups[group["id"]] = group
+        self.group_names[name.casefold()] = group["id"]
+        return 201, group
+
+    def get_group(self, query, body, id):
+        group = self.groups.get(id)
+        return (200, group) if group else (404, {"detail": "Group not found"})
+
+    def patch_group(self, query, body, id):
+        group = self.groups.get(id)
+        if group is None:
+            return 404, {"detail": "Group not found"}
+        members = {m["value"] for m in group["members"]}
+        for operation in (body or {}).get("Operations", []):
+            values = {v["value"] for v in operation.get("value", [])}
+            if operation.get("op") == "add":
+                members |= values
+            elif operation.get("op") == "remove":
+                members -= values
+        group["members"] = [{"value": value} for value in sorted(members)]
+        return 204, None
+
+    def scim_bulk_request(self, query, body):
+        if not self.scim_bulk:
+            return 501, {"detail": "Bulk is not supported"}
+        results = []
+        for operation in (body or {}).get("Operations", []):
+            path = operation.get("path", "")
+            if operation.get("method") == "POST" and path == "/Users":
+                status, resource = self.create_user(query, operation.get("data"))
+                location = f"/api/v2/scim/Users/{resource['id']}" if status == 201 else None
+            elif operation.get("method") == "DELETE" and path.startswith("/Users/"):
+                status, resource = self.delete_user(query, None, path.rsplit("/", 1)[-1])
+                location = None
+            else:
+                status, resource, location = 400, {"detail": "unsupported operation"}, None
+            result = {"bulkId": operation.get("bulkId"), "method": operation.get("method"), "status": str(status)}
+            if location:
+                result["location"] = location
+            if status >= 400:
+                result["response"] = resource
+            results.append(result)
+        return 200, {"schemas": ["urn:ietf:params:scim:api:messages:2.0:BulkResponse"], "Operations": results}
+
+    # ----- private apps -----
+
+    def _tag(self, name):
+        if name not in self.tags:
+            self.tags[name] = self.next_id()
+        return {"tag_id": self.tags[name], "tag_name": name}
+
+    def _app_record(self, app_id, body):
+        hosts = body.get("host") or []
+        if isinstance(hosts, str):
+            hosts = hosts.split(",")
+        publishers = []
+        for publisher in body.get("publishers") or []:
+            publisher_id = publisher.get("publisher_id")
+            known = next((p for p in self.publishers if str(p["publisher_id"]) == str(publisher_id)), None)
+            if known:
+                publishers.append(dict(known))
+        return {
+            "app_id": app_id,
+            "app_name": body.get("app_name"),
+            "host": ",".join(h.strip() for h in hosts),
+            "clientless_access": str(body.get("clientless_access", "false")).lower() == "true",
+            "private_app_protocol": body.get("private_app_protocol"),
+            "use_publisher_dns": bool(body.get("use_publisher_dns")),
+            "protocols": [{"port": str(p.get("port")), "transport": p.get("type") or p.get("transport")}
+                          for p in body.get("protocols") or []],
+            "service_publisher_assignments": publishers,
+            "tags": [self._tag(t["tag_name"]) for t in body.get("tags") or [] if t.get("tag_name")],
+            "modify_time": self.modified(),
+        }
+
+    def _index_app(self, app):
+        self.apps[app["app_id"]] = app
+        self.app_names[app["app_name"]] = app["app_id"]
+        for host in app["host"].lower().split(","):
+            if host:
+                self.app_hosts.setdefault(host, set()).add(app["app_id"])
+
+    def _unindex_app(self, app):
+        self.apps.pop(app["app_id"], None)
+        self.app_names.pop(app["app_name"], None)
+        for host in app["host"].lower().split(","):
+            self.app_hosts.get(host, set()).discard(app["app_id"])
+
+    def list_apps(self, query, body):
+        # Apps are kept in creation order, which is also app_id order
+        apps = list(self.apps.values())
+        search = query.get("query", [""])[0]
+        match = re.fullmatch(r'\s*name\s+(sw|has|eq)\s+"?(.*?)"?\s*', search) if search else None
+        if match:
+            op, value = match.group(1), match.group(2).lower()
+            if op == "sw":
+                apps = [a for a in apps if a["app_name"].startswith(match.group(2))]
+            elif op == "eq":
+                apps = [a for a in apps if a["app_name"].lower() == value]
+            elif value in self.app_hosts:
+                apps = [self.apps[app_id] for app_id in sorted(self.app_hosts[value])]
+            else:
+                apps = [a for a in apps if value in a["app_name"].lower() or value in a["host"].lower()]
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", [str(len(apps) or 1)])[0])
+        return 200, {"status": "success", "total": len(apps),
+                     "data": {"private_apps": self.project(apps[offset:offset + limit], query)}}
+
+    def get_app(self, query, body, id):
+        app = self.apps.get(int(id))
+        if app is None:
+            return 404, {"status": "error", "message": "Private app not found"}
+        return 200, {"status": "success", "data": app}
+
+    def create_app(self, query, body):
+        body = body or {}
+        name = body.get("app_name")
+        if not name or not body.get("host"):
+            return 400, {"status": "error", "message": "app_name and host are required"}
+        if name in self.app_names:
+            return 409, {"status": "error", "message": f"Private app {name} already exists"}
+        app = self._app_record(self.next_id(), body)
+        self._index_app(app)
+        return 200, {"status": "success", "data": {"app_id": app["app_id"], "app_name": name}}
+
+    def update_app(self, query, body, id):
+        app_id = int(id)
+        if app_id not in self.apps:
+            return 404, {"status": "error", "message": "Private app not found"}
+        current = self.apps[app_id]
+        merged = dict(current, **(body or {}))
+        if "publishers" not in (body or {}):
+            merged["publishers"] = current["service_publisher_assignments"]
+        self._unindex_app(current)
+        self._index_app(self._app_record(app_id, merged))
+        return 200, {"status": "success", "data": {"app_id": app_id}}
+
+    def delete_apps(self, query, body):
+        ids = [int(x) for x in (body or {}).get("private_app_ids", [])]
+        for app_id in ids:
+            if app_id in self.apps:
+                self._unindex_app(self.apps[app_id])
+        return 200, {"status": "success", "data": {"deleted": len(ids)}}
+
+    def list_tags(self, query, body):
+        return 200, {"status": "success",
+                     "data": {"tags": [{"tag_id": tag_id, "tag_name": name} for name, tag_id in self.tags.items()]}}
+
+    def apply_tags(self, query, body):
+        names = [t["tag_name"] for t in (body or {}).get("tags", []) if t.get("tag_name")]
+        changed = []
+        for app_id in (body or {}).get("ids", []):
+            app = self.apps.get(int(app_id))
+            if app is None:
+                continue
+            current = {t["tag_name"] for t in app["tags"]}
+            app["tags"].extend(self._tag(name) for name in names if name not in current)
+            app["modify_time"] = self.modified()
+            changed.append({"id": app["app_id"], "name": app["app_name"]})
+        return 200, {"status": "success", "data": changed}
+
+    def remove_tags(self, query, body):
+        names = {t["tag_name"] for t in (body or {}).get("tags", [])}
+        for app_id in (body or {}).get("ids", []):
+            app = self.apps.get(int(app_id))
+            if app is not None:
+                app["tags"] = [t for t in app["tags"] if t["tag_name"] not in names]
+                app["modify_time"] = self.modified()
+        return 200, {"status": "success"}
+
+    def set_publishers(self, method, query, body):
+        # PUT replaces, PATCH adds and DELETE removes the given publishers
+        body = body or {}
+        ids = {str(x) for x in body.get("publisher_ids", [])}
+        chosen = [dict(p) for p in self.publishers if str(p["publisher_id"]) in ids]
+        for app_id in body.get("private_app_ids", []):
+            app = self.apps.get(int(app_id))
+            if app is None:
+                continue
+            current = app["service_publisher_assignments"]
+            if method == "PUT":
+                app["service_publisher_assignments"] = chosen
+            elif method == "PATCH":
+                known = {str(p["publisher_id"]) for p in current}
+                current.extend(p for p in chosen if str(p["publisher_id"]) not in known)
+            else:
+                app["service_publisher_assignments"] = [p for p in current if str(p["publisher_id"]) not in ids]
+            app["modify_time"] = self.modified()
+        return 200, {"status": "success"}
+
+    def list_publishers(self, query, body):
+        return 200, {"status": "success", "data": {"publishers": self.publishers}}
+
+    # ----- NPA rules -----
+
+    def list_rules(self, query, body):
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", [str(len(self.rules) or 1)])[0])
+        return 200, {"status": "success", "total": len(self.rules),
+                     "data": self.project(self.rules[offset:offset + limit], query)}
+
+    def get_rule(self, query, body, id):
+        rule = next((r for r in self.rules if str(r["rule_id"]) == id), None)
+        if rule is None:
+            return 404, {"status": "error", "message": "Rule not found"}
+        return 200, {"status": "success", "data": rule}
+
+    def create_rule(self, query, body):
+        body = body or {}
+        name = body.get("rule_name")
+        if not name:
+            return 400, {"status": "error", "message": "rule_name is required"}
+        if name in self.rule_names:
+            return 400, {"status": "error", "message": f"Rule {name} may exist already"}
+        rule = {"rule_id": self.next_id(), "rule_name": name, "group_name": body.get("group_name"),
+                "enabled": body.get("enabled"), "rule_data": body.get("rule_data"), "modify_time": self.modified()}
+        order = body.get("rule_order") or {}
+        position = len(self.rules)
+        if order.get("order") == "top":
+            position = 0
+        elif order.get("order") in ("after", "before") and order.get("rule_id") is not None:
+            index = next((i for i, r in enumerate(self.rules) if str(r["rule_id"]) == str(order["rule_id"])), None)
+            if index is None:
+                return 400, {"status": "error", "message": f"Rule {order['rule_id']} not found"}
+            position = index + 1 if order["order"] == "after" else index
+        self.rules.insert(position, rule)
+        self.rule_names.add(name)
+        return 200, {"status": "success", "data": {"rule_id": rule["rule_id"], "rule_name": name}}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body leave in one write; split small writes stall on delayed ACKs
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _dispatch(self):
+        mock = self.server.mock
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            self._send(400, {"status": "error", "message": "invalid JSON"}, {})
+            return
+
+        route = parts.path[len("/api/v2/"):] if parts.path.startswith("/api/v2/") else parts.path
+        family = route.split("/", 1)[0]
+        allowed, headers = mock.admit(family if family in FAMILIES else "other")
+        mock.delay()
+        if not allowed:
+            self._send(429, {"status": "error", "message": "Too many requests"}, headers)
+            return
+        if mock.inject_error():
+            self._send(500, {"status": "error", "message": "Injected failure"}, headers)
+            return
+
+        status, payload = mock.handle(self.command, parts.path, parse_qs(parts.query), body)
+        self._send(status, payload, headers)
+
+    def _send(self, status, payload, headers):
+        data = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, mock=None, host="127.0.0.1", port=0, verbose=False):
+        super().__init__((host, port), MockHandler)
+        self.mock = mock or MockNetskope()
+        self.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline mock of the Netskope REST API v2")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random seconds around --latency")
+    parser.add_argument("--rate", type=int, default=0, help="requests per second per endpoint family (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--publishers", type=int, default=5, help="number of publishers to seed")
+    parser.add_argument("--no-scim-bulk", action="store_true", help="advertise SCIM /Bulk as unsupported")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    mock = MockNetskope(latency=args.latency, jitter=args.jitter, rate=args.rate, error_rate=args.error_rate,
+                        publishers=args.publishers, scim_bulk=not args.no_scim_bulk)
+    server = MockServer(mock, args.host, args.port, verbose=args.verbose)
+    print(f"Mock Netskope API listening on {server.url}/api/v2 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,25 @@
+import Netskope_API_Tool_v2 as tool
+
+APPS = [
+    {"app_id": 1, "app_name": "Web_a", "host": "a.example.com"},
+    {"app_id": 2, "app_name": "web_b", "host": "b.example.com"},
+    {"app_id": 3, "app_name": "Web_c", "host": "c.example.com"},
+]
+
+
+def build_index():
+    index = tool.AppIndex()
+    index.sync(APPS)
+    return index
+
+
+def test_prefix_is_case_sensitive():
+    matches, ambiguous = build_index().prefix("Web")
+    assert [app["app_id"] for app in matches] == [1, 3]
+    assert ambiguous
+
+
+def test_blank_prefix_matches_nothing():
+    index = build_index()
+    assert index.prefix("") == ([], False)
+    assert index.prefix("   ") == ([], False)
@@ -0,0 +1,140 @@
+import csv
+
+import pytest
+
+pytest.importorskip("pandas")
+
+import Netskope_API_Tool_v2 as tool
+
+HEADER = ["Name", "Host", "Tag", "Publisher", "Port", "Suffix", "Access Type", "AnyApp Protocol", "Use Publisher DNS"]
+PUBLISHERS = [{"publisher_id": 1, "publisher_name": "pub-1"}, {"publisher_id": 2, "publisher_name": "pub-2"}]
+
+
+@pytest.fixture(autouse=True)
+def publishers(monkeypatch):
+    catalogue = {
+        "publishers": PUBLISHERS,
+        "by_name": {p["publisher_name"]: p for p in PUBLISHERS},
+        "by_folded": {p["publisher_name"].casefold(): p for p in PUBLISHERS},
+    }
+    monkeypatch.setattr(tool, "get_publisher_catalogue", lambda refresh=False: catalogue)
+
+
+def compile_rows(tmp_path, *rows):
+    path = tmp_path / "apps.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    source = tool.open_rows(str(path), required=tool.APP_REQUIRED_COLUMNS)
+    try:
+        return tool.compile_apps(source)
+    finally:
+        source.close()
+
+
+def row(name="app", host="app.corp.local", tag="", publisher="pub-1", port="tcp:443", suffix="S",
+        access="Client", anyapp="", dns="false"):
+    return [name, host, tag, publisher, port, suffix, access, anyapp, dns]
+
+
+def test_valid_row_compiles_to_one_job(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(tag="a, b", port="tcp:443, udp:5000-5010", dns="yes"))
+
+    assert errors == []
+    assert len(jobs) == 1
+    data = jobs[0]["data"]
+    assert jobs[0]["line"] == 2
+    assert data["app_name"] == "S_app"
+    assert data["host"] == ["app.corp.local"]
+    assert data["protocols"] == [{"port": "443", "type": "tcp"}, {"port": "5000-5010", "type": "udp"}]
+    assert data["publishers"] == [PUBLISHERS[0]]
+    assert data["tags"] == [{"tag_name": "a"}, {"tag_name": "b"}]
+    assert data["use_publisher_dns"] is True
+
+
+def test_several_hosts_use_the_combined_name(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(host="a.local, b.local"))
+
+    assert errors == []
+    assert jobs[0]["data"]["app_name"] == "S_Combined_2"
+    assert jobs[0]["data"]["host"] == ["a.local", "b.local"]
+
+
+def test_client_and_browser_access_compile_to_two_apps(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(access="Client, Browser", anyapp="https"))
+
+    assert errors == []
+    assert [job["data"]["app_name"] for job in jobs] == ["S_app", "S_app_Browser"]
+    assert jobs[1]["data"]["clientless_access"] == "true"
+    assert jobs[1]["data"]["private_app_protocol"] == "https"
+
+
+def test_host_cell_without_hosts_is_rejected(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(host=",,"))
+
+    assert jobs == []
+    assert [(e["line"], e["column"], e["error"]) for e in errors] == [(2, "Host", "no host in the cell")]
+
+
+def test_empty_required_value_is_rejected(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(host=""))
+
+    assert jobs == []
+    assert [(e["column"], e["error"]) for e in errors] == [("Host", "required value is empty")]
+
+
+def test_only_the_out_of_range_port_is_reported(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(port="tcp:22, tcp:0, udp:10-70000"))
+
+    assert jobs == []
+    assert [(e["column"], e["value"]) for e in errors] == [("Port", "tcp:0"), ("Port", "udp:10-70000")]
+    assert {e["error"] for e in errors} == {"port must be between 1 and 65535"}
+
+
+def test_malformed_port_is_reported(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(port="tcp:443, 8080, icmp:1"))
+
+    assert jobs == []
+    assert [e["value"] for e in errors] == ["8080", "icmp:1"]
+
+
+def test_browser_access_requires_a_protocol(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(access="Browser", anyapp="ftp"))
+
+    assert jobs == []
+    assert [(e["column"], e["error"]) for e in errors] == [("AnyApp Protocol", "Browser access requires http or https")]
+
+
+def test_unknown_access_type_and_publisher_are_reported(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(access="Tunnel", publisher="pub-1, missing"))
+
+    assert jobs == []
+    assert sorted((e["column"], e["value"]) for e in errors) == [("Access Type", "Tunnel"), ("Publisher", "missing")]
+
+
+def test_duplicated_app_names_are_reported_on_every_line(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(), row(host="other.local"), row(name="other"))
+
+    assert [job["line"] for job in jobs] == [4]
+    assert [(e["line"], e["error"]) for e in errors] == [(2, "app name is duplicated in the sheet"),
+                                                         (3, "app name is duplicated in the sheet")]
+
+
+def test_invalid_line_does_not_block_valid_ones(tmp_path):
+    jobs, errors = compile_rows(tmp_path, row(port="tcp:0"), row(name="ok"))
+
+    assert [job["data"]["app_name"] for job in jobs] == ["S_ok"]
+    assert [e["line"] for e in errors] == [2]
+
+
+@pytest.mark.parametrize("column, value", [
+    ("Port", ","), ("Publisher", " , "), ("Access Type", ","), ("Tag", ",,"),
+])
+def test_cell_without_entries_is_rejected(tmp_path, column, value):
+    cells = {"Port": "port", "Publisher": "publisher", "Access Type": "access", "Tag": "tag"}
+    jobs, errors = compile_rows(tmp_path, row(**{cells[column]: value}))
+
+    assert jobs == []
+    assert [(e["line"], e["column"]) for e in errors] == [(2, column)]
+    assert errors[0]["error"].startswith("no ")